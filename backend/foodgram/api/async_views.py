@@ -0,0 +1,120 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import partial, wraps
+from time import perf_counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections, connections
+
+orm_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_ORM_THREADS, thread_name_prefix='orm'
+)
+
+
+def run_view(view, request, args, kwargs):
+    """Вызов синхронного вью DRF и рендер ответа в потоке пула."""
+    close_old_connections()
+    try:
+        with ExitStack() as stack:
+            timer = getattr(request, 'metrics_timer', None)
+            if timer is not None:
+                # запросы идут из потока пула, а не из потока
+                # middleware, поэтому счетчик подключается здесь
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timer))
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                start = perf_counter()
+                response.render()
+                request.metrics_render = perf_counter() - start
+            if response.streaming:
+                response.async_streaming_content = pull_in_pool(
+                    iter(response)
+                )
+    finally:
+        close_old_connections()
+    return response
+
+
+def next_part(parts):
+    """Следующий блок потокового ответа или None в конце."""
+    close_old_connections()
+    try:
+        return next(parts, None)
+    finally:
+        close_old_connections()
+
+
+async def pull_in_pool(parts):
+    """Блоки потокового ответа, читаемые по одному в потоках пула.
+
+    ASGI-обработчик Django 3.2 перебирает streaming_content в цикле
+    событий, где запросы к базе запрещены. Собирать ответ целиком
+    нельзя: пропадет ограниченная память выгрузки, поэтому каждый
+    блок запрашивается в orm_executor, а в памяти лежит только он.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        part = await loop.run_in_executor(orm_executor, next_part, parts)
+        if part is None:
+            return
+        yield part
+
+
+def async_view(view):
+    """Асинхронная обертка над синхронным вью.
+
+    Цикл событий обслуживает медленные соединения, а вью, работа
+    с ORM и сериализация выполняются в общем пуле orm_executor.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            orm_executor,
+            partial(context.run, run_view, view, request, args, kwargs)
+        )
+    return wrapper
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """ASGI-обработчик, отдающий потоковые ответы из пула orm_executor.
+
+    Ответы с async_streaming_content читаются асинхронно, блок
+    за блоком; остальные отправляются как в ASGIHandler.
+    """
+
+    async def send_response(self, response, send):
+        parts = getattr(response, 'async_streaming_content', None)
+        if parts is None:
+            return await super().send_response(response, send)
+        response_headers = [
+            (header.encode('ascii'), value.encode('latin1'))
+            for header, value in response.items()
+        ]
+        for cookie in response.cookies.values():
+            response_headers.append((
+                b'Set-Cookie',
+                cookie.output(header='').encode('ascii').strip()
+            ))
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': response_headers,
+        })
+        try:
+            async for part in parts:
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+        finally:
+            await parts.aclose()
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
@@ -1,7 +1,29 @@
-from django.db.models import Q
+from django.db import connection
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as django_filters
 
-from recipe.models import Recipe
+from recipe.models import FavoriteRecipes, Recipe, ShoppingList
+from recipe.search import filter_by_tags, search_recipes
+
+TAGS_MATCH_ANY = 'any'
+TAGS_MATCH_ALL = 'all'
+
+
+class RecipeOrderingFilter(django_filters.OrderingFilter):
+    """Сортировка с id в конце ключа.
+
+    Порядок совпадает с индексами (поле, id), а страницы стабильны
+    при одинаковых значениях поля.
+    """
+
+    def filter(self, queryset, value):
+        queryset = super().filter(queryset, value)
+        if value:
+            descending = value[0].startswith('-')
+            queryset = queryset.order_by(
+                *queryset.query.order_by, '-id' if descending else 'id'
+            )
+        return queryset
 
 
 class RecipeFilter(django_filters.FilterSet):
@@ -15,40 +37,72 @@ class RecipeFilter(django_filters.FilterSet):
         field_name='tags__slug',
         method='filter_tags',
     )
+    tags_match = django_filters.ChoiceFilter(
+        choices=((TAGS_MATCH_ANY, TAGS_MATCH_ANY),
+                 (TAGS_MATCH_ALL, TAGS_MATCH_ALL)),
+        method='filter_tags_match',
+    )
     is_favorited = django_filters.BooleanFilter(method='filter_is_favorited')
+    search = django_filters.CharFilter(method='filter_search')
+    ordering = RecipeOrderingFilter(
+        fields=(('favorites_count', 'favorites'), ('created', 'created'))
+    )
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_in_shopping_cart', 'is_favorited']
+        fields = [
+            'author', 'tags', 'tags_match', 'is_in_shopping_cart',
+            'is_favorited', 'search', 'ordering'
+        ]
 
     def filter_tags(self, queryset, name, value):
-        """Фильтрация по тегам."""
+        """Фильтрация по тегам: любой из них или, с tags_match=all, все."""
         tag_slugs = self.request.GET.getlist('tags')
 
         if not tag_slugs:
             return queryset
 
-        query = Q()
-        for tag_slug in tag_slugs:
-            query |= Q(tags__slug=tag_slug)
+        return filter_by_tags(
+            queryset, tag_slugs,
+            match_all=self.form.cleaned_data.get('tags_match')
+            == TAGS_MATCH_ALL
+        )
+
+    def filter_tags_match(self, queryset, name, value):
+        """Режим учитывается в filter_tags."""
+        return queryset
 
-        return queryset.filter(query).distinct()
+    def in_user_list(self, model):
+        """EXISTS по индексу (user, recipe) избранного или корзины.
+
+        Размер запроса не зависит от числа рецептов у пользователя,
+        в отличие от id__in по кешированному набору.
+        """
+        return Exists(model.objects.filter(
+            user=self.request.user, recipe=OuterRef('pk')
+        ))
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         """Фильтрация по полю is_in_shopping_cart."""
         if value:
-            user = self.request.user
-            return queryset.filter(shopping_list__user_id=user.id)
+            if self.request.user.is_anonymous:
+                return queryset.none()
+            return queryset.filter(self.in_user_list(ShoppingList))
         return queryset
 
     def filter_is_favorited(self, queryset, name, value):
         """Фильтрация по полю is_favorited."""
         if value is not None:
-            user = self.request.user
-            if user.is_anonymous:
+            if self.request.user.is_anonymous:
                 return queryset
             if value:
-                return queryset.filter(favorited__user=user)
+                return queryset.filter(self.in_user_list(FavoriteRecipes))
             else:
-                return queryset.exclude(favorited__user=user)
+                return queryset.filter(~self.in_user_list(FavoriteRecipes))
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию и описанию."""
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value, connection)
@@ -0,0 +1,126 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+
+
+class RouteStats:
+    """Накопленные значения по одному маршруту."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.db_duration = 0.0
+        self.serialize_duration = 0.0
+        self.render_duration = 0.0
+        self.response_bytes = 0
+
+    def observe(self, duration, queries, db_duration, serialize_duration,
+                render_duration, response_bytes):
+        self.buckets[bisect_left(LATENCY_BUCKETS, duration)] += 1
+        self.count += 1
+        self.duration += duration
+        self.queries += queries
+        self.db_duration += db_duration
+        self.serialize_duration += serialize_duration
+        self.render_duration += render_duration
+        self.response_bytes += response_bytes
+
+
+class MetricsRegistry:
+    """Метрики запросов процесса в формате Prometheus.
+
+    Значения накапливаются в памяти процесса: при нескольких воркерах
+    каждый отдает свою часть, суммирование делает Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = defaultdict(RouteStats)
+
+    def observe(self, route, method, **values):
+        with self._lock:
+            self._routes[(route, method)].observe(**values)
+
+    def render(self):
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = [
+                '# HELP foodgram_request_duration_seconds '
+                'Время обработки запроса.',
+                '# TYPE foodgram_request_duration_seconds histogram',
+            ]
+            for (route, method), stats in routes:
+                labels = f'route="{route}",method="{method}"'
+                total = 0
+                for bound, count in zip(
+                    (*LATENCY_BUCKETS, '+Inf'), stats.buckets
+                ):
+                    total += count
+                    lines.append(
+                        'foodgram_request_duration_seconds_bucket'
+                        f'{{{labels},le="{bound}"}} {total}'
+                    )
+                lines.append(
+                    f'foodgram_request_duration_seconds_sum{{{labels}}} '
+                    f'{stats.duration}'
+                )
+                lines.append(
+                    f'foodgram_request_duration_seconds_count{{{labels}}} '
+                    f'{stats.count}'
+                )
+            for name, attribute, help_text in (
+                ('foodgram_db_queries_total', 'queries',
+                 'Число SQL-запросов.'),
+                ('foodgram_db_duration_seconds_total', 'db_duration',
+                 'Время выполнения SQL-запросов.'),
+                ('foodgram_serialize_duration_seconds_total',
+                 'serialize_duration', 'Время сериализации данных.'),
+                ('foodgram_render_duration_seconds_total', 'render_duration',
+                 'Время рендеринга ответа в JSON.'),
+                ('foodgram_response_bytes_total', 'response_bytes',
+                 'Размер ответов.'),
+            ):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for (route, method), stats in routes:
+                    lines.append(
+                        f'{name}{{route="{route}",method="{method}"}} '
+                        f'{getattr(stats, attribute)}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def timed_serialization(request):
+    """Время получения serializer.data в статистику запроса.
+
+    Считается только внешний сериалайзер: вложенные выполняются
+    внутри него. Время включает запросы к базе, сделанные во время
+    сериализации. Вне замера middleware (команды, тесты без
+    запроса) ничего не считается.
+    """
+    request = getattr(request, '_request', request)
+    if (
+        not hasattr(request, 'metrics_serialize')
+        or request.metrics_serializing
+    ):
+        yield
+        return
+    request.metrics_serializing = True
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        request.metrics_serialize += perf_counter() - start
+        request.metrics_serializing = False
@@ -0,0 +1,154 @@
+import asyncio
+from contextlib import ExitStack
+from time import perf_counter
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .metrics import registry
+from core.replicas import stick_to_primary
+
+
+class QueryTimer:
+    """Обертка execute_wrapper: считает SQL-запросы и их время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += perf_counter() - start
+
+
+class RequestMetricsMiddleware:
+    """Замер запроса: SQL, сериализация, рендеринг, размер ответа.
+
+    Результат отдается клиенту в заголовке Server-Timing и копится
+    в гистограммах по маршрутам (вьюсет и действие DRF).
+    Поддерживает и синхронный, и асинхронный (ASGI) режим; в ASGI
+    запросы считаются у вью из api.async_views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # как в MiddlewareMixin: Django увидит, что вызов
+            # возвращает корутину, и не станет адаптировать цепочку
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.acall(request)
+        timer = self.start(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        return self.finish(request, response)
+
+    async def acall(self, request):
+        self.start(request)
+        response = await self.get_response(request)
+        return self.finish(request, response)
+
+    def start(self, request):
+        request.metrics_timer = QueryTimer()
+        request.metrics_route = 'unmatched'
+        request.metrics_serialize = 0.0
+        request.metrics_serializing = False
+        request.metrics_render = 0.0
+        request.metrics_start = perf_counter()
+        return request.metrics_timer
+
+    def finish(self, request, response):
+        timer = request.metrics_timer
+        duration = perf_counter() - request.metrics_start
+        response_bytes = (
+            0 if response.streaming else len(response.content)
+        )
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={timer.duration * 1000:.1f};desc="{timer.count} SQL"',
+            f'serialize;dur={request.metrics_serialize * 1000:.1f}',
+            f'render;dur={request.metrics_render * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ))
+        registry.observe(
+            request.metrics_route,
+            request.method,
+            duration=duration,
+            queries=timer.count,
+            db_duration=timer.duration,
+            serialize_duration=request.metrics_serialize,
+            render_duration=request.metrics_render,
+            response_bytes=response_bytes,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is None:
+            request.metrics_route = (
+                f'{view_func.__module__}.{view_func.__name__}'
+            )
+            return None
+        actions = getattr(view_func, 'actions', None) or {}
+        action = actions.get(request.method.lower(), request.method.lower())
+        request.metrics_route = f'{view_class.__name__}.{action}'
+        return None
+
+    def process_template_response(self, request, response):
+        """Рендеринг ответа DRF (JSON); сериализация - в вью."""
+        start = perf_counter()
+
+        def rendered(response):
+            request.metrics_render = perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class StickyPrimaryMiddleware:
+    """После изменяющего запроса пользователь читает из основной базы.
+
+    Пользователь берется после ответа: DRF подставляет в запрос
+    пользователя, определенного по токену.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.acall(request)
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            self.remember_write(request, response)
+        return response
+
+    async def acall(self, request):
+        response = await self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            # пользователь сессии загружается из базы при обращении
+            await sync_to_async(self.remember_write)(request, response)
+        return response
+
+    def remember_write(self, request, response):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            stick_to_primary(response, user.id)
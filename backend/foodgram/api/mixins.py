@@ -0,0 +1,154 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import get_conditional_response
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from core.models import Subscribe
+from core.replicas import choose_replica, primary, read_from, use_read_alias
+from recipe.catalog import catalog_responses, get_catalog_version
+from recipe.membership import get_request_membership
+from recipe.versions import AUTHOR, RECIPE, get_version
+
+RECIPE_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def content_etag(data):
+    """Сильный ETag по содержимому ответа."""
+    content = json.dumps(
+        data, cls=DjangoJSONEncoder, ensure_ascii=False, sort_keys=True
+    )
+    return '"{}"'.format(hashlib.md5(content.encode()).hexdigest())
+
+
+class CachedCatalogMixin:
+    """Ответы справочника из кеша процесса с ETag.
+
+    Данные берутся из кеша по версии справочника, поэтому повторный
+    запрос не обращается к базе, а запрос с совпадающим ETag
+    получает 304 без тела. ETag считается по данным, а не по версии:
+    он одинаков во всех процессах и не меняется, когда версия
+    пересоздается без изменения справочника. Last-Modified
+    не отдается - в справочниках нет времени изменения.
+    """
+
+    catalog = None
+
+    def list_data(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return list(self.get_serializer(queryset, many=True).data)
+
+    def retrieve_data(self, request):
+        return self.get_serializer(self.get_object()).data
+
+    def cached_response(self, request, get_data):
+        key = (
+            self.catalog, get_catalog_version(self.catalog),
+            request.get_full_path()
+        )
+        entry = catalog_responses.get(key)
+        if entry is None:
+            with primary():
+                data = get_data(request)
+            entry = (data, content_etag(data))
+            catalog_responses.set(key, entry)
+        data, etag = entry
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(data)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, self.list_data)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, self.retrieve_data)
+
+
+class CachedRecipeMixin:
+    """Представление рецепта из кеша Django с флагами пользователя.
+
+    В кеше хранится общая для всех часть ответа (автор, теги,
+    ингредиенты, изображение, текст) под версией рецепта; версия
+    автора проверяется при чтении. Версия рецепта меняется и при
+    изменении встроенных в него тегов и ингредиентов, поэтому версии
+    справочников, истекающие в кеше процесса, в ключ не входят. Флаги
+    is_favorited, is_in_shopping_cart и is_subscribed подставляются
+    при каждом ответе.
+    """
+
+    def representation_key(self, request, recipe_id):
+        return ':'.join((
+            'recipe', str(recipe_id), 'representation',
+            get_version(RECIPE, recipe_id),
+            # ссылки на изображения абсолютные
+            request.get_host(),
+        ))
+
+    def cached_representation(self, request, recipe_id):
+        key = self.representation_key(request, recipe_id)
+        entry = cache.get(key)
+        if entry is not None:
+            author_id, author_version, data = entry
+            if get_version(AUTHOR, author_id) == author_version:
+                return data
+        with primary():
+            instance = self.get_object()
+            author_version = get_version(AUTHOR, instance.author_id)
+            data = self.get_serializer(instance).data
+        cache.set(
+            key, (instance.author_id, author_version, data),
+            RECIPE_CACHE_TIMEOUT
+        )
+        return data
+
+    def add_user_flags(self, request, recipe_id, data):
+        data = dict(data)
+        author = dict(data['author'])
+        user = request.user
+        if user.is_authenticated:
+            membership = get_request_membership(request)
+            data['is_favorited'] = recipe_id in membership.favorites
+            data['is_in_shopping_cart'] = (
+                recipe_id in membership.shopping_cart
+            )
+            author['is_subscribed'] = Subscribe.objects.filter(
+                subscriber=user, author_id=author['id']
+            ).exists()
+        else:
+            data['is_favorited'] = False
+            data['is_in_shopping_cart'] = False
+            author['is_subscribed'] = False
+        data['author'] = author
+        return data
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe_id = str(kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+        if not recipe_id.isdigit():
+            return super().retrieve(request, *args, **kwargs)
+        recipe_id = int(recipe_id)
+        data = self.cached_representation(request, recipe_id)
+        return Response(self.add_user_flags(request, recipe_id, data))
+
+
+class ReplicaReadMixin:
+    """Безопасные запросы к вьюсету читают из реплики.
+
+    Реплика выбирается после аутентификации: пользователь, недавно
+    изменявший данные, читает из основной базы. Выбор действует
+    только до конца обработки запроса.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with read_from(None):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            use_read_alias(choose_replica(request))
@@ -0,0 +1,125 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class RecipePagination(PageNumberPagination):
+    """Пагинация рецептов: по номеру страницы или по курсору.
+
+    Режим курсора включается параметром cursor (пустой - первая
+    страница). Страница выбирается условием по ключу сортировки
+    (поле, id) и составному индексу, без OFFSET и COUNT, поэтому
+    глубокие страницы не медленнее первой, а новые рецепты не сдвигают
+    уже полученные. Ключ берется из текущей сортировки (?ordering=),
+    по умолчанию (created, id); сортировка не по полю из
+    cursor_fields, например по релевантности поиска, с курсором
+    не сочетается.
+    """
+
+    cursor_query_param = 'cursor'
+    ordering = ('-created', '-id')
+    cursor_fields = ('created', 'favorites_count')
+    invalid_cursor_message = 'Некорректный курсор.'
+    unsupported_ordering_message = (
+        'Курсор поддерживает сортировку только по полям: {fields}.'
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not queryset.query.order_by:
+            queryset = queryset.order_by(*self.ordering)
+        self.cursor_field, descending = self.get_cursor_key(queryset)
+        position = self.decode_cursor(
+            request.query_params[self.cursor_query_param], queryset.model
+        )
+        if position is not None:
+            value, id = position
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.cursor_field}__{lookup}': value})
+                | Q(**{self.cursor_field: value, f'id__{lookup}': id})
+            )
+        # лишняя запись показывает, есть ли следующая страница
+        results = list(queryset[:page_size + 1])
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+        return self.page
+
+    def get_cursor_key(self, queryset):
+        """Поле ключа и направление сортировки (поле, id)."""
+        ordering = queryset.query.order_by
+        if len(ordering) == 2:
+            field, tiebreak = ordering
+            descending = field.startswith('-')
+            field = field.lstrip('-')
+            if (
+                field in self.cursor_fields
+                and tiebreak == ('-id' if descending else 'id')
+            ):
+                return field, descending
+        raise ValidationError({self.cursor_query_param: [
+            self.unsupported_ordering_message.format(
+                fields=', '.join(self.cursor_fields)
+            )
+        ]})
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(getattr(last, self.cursor_field), last.id)
+        )
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        return None
+
+    def encode_cursor(self, value, id):
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        value = f'{self.cursor_field}|{value}|{id}'
+        return urlsafe_b64encode(value.encode()).decode()
+
+    def decode_cursor(self, cursor, model):
+        """Значение поля и id последней записи; курсор другой
+        сортировки некорректен."""
+        if not cursor:
+            return None
+        try:
+            field, value, id = urlsafe_b64decode(
+                cursor.encode()
+            ).decode().split('|')
+            if field != self.cursor_field:
+                raise ValueError(field)
+            value = model._meta.get_field(field).to_python(value)
+            id = int(id)
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, id
@@ -1,17 +1,50 @@
 import base64
+import json
 import uuid
 
 from django.core.files.base import ContentFile
 from django.core.validators import RegexValidator, validate_email
+from django.db import transaction
+from django.http import QueryDict
+from PIL import Image
 from rest_framework import serializers
 
+from .metrics import timed_serialization
 from core.models import Subscribe, User
+from recipe.membership import get_request_membership
 from recipe.models import (FavoriteRecipes, Ingredient, IngredientRecipe,
                            Recipe, ShoppingList, Tag)
+from recipe.services import ingredient_amounts, update_recipe_totals
 
 CHARFIELD_MAX_LENGTH = 150
 EMAIL_MAX_LENGTH = 254
 AMOUNT_MIN = 0
+DEFAULT_RECIPES_LIMIT = 3
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png'}
+IMAGE_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_SIDE = 5000
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """Список объектов с замером сериализации для метрик запроса."""
+
+    @property
+    def data(self):
+        with timed_serialization(self.context.get('request')):
+            return super().data
+
+
+class TimedSerializerMixin:
+    """Замер сериализации ответа для метрик запроса.
+
+    Для списков в Meta задается list_serializer_class =
+    TimedListSerializer.
+    """
+
+    @property
+    def data(self):
+        with timed_serialization(self.context.get('request')):
+            return super().data
 
 
 class UserRequiredFieldsSerializerMixin(serializers.ModelSerializer):
@@ -33,6 +66,7 @@ class UserRequiredFieldsSerializerMixin(serializers.ModelSerializer):
 
 
 class UserProfileSerializer(
+    TimedSerializerMixin,
     UserRequiredFieldsSerializerMixin,
     serializers.ModelSerializer
 ):
@@ -62,6 +96,7 @@ class UserProfileSerializer(
             'avatar',
             'is_subscribed'
         ]
+        list_serializer_class = TimedListSerializer
 
     def validate(self, data):
 
@@ -94,6 +129,9 @@ class UserProfileSerializer(
         return user_object
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            # значение уже вычислено во вьюсете
+            return obj.is_subscribed
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             subscriber = request.user
@@ -107,7 +145,8 @@ class UserProfileSerializer(
         representation = super().to_representation(instance)
         representation.pop('password', None)
         request = self.context.get('request')
-        if request and 'users' in request.path:
+        # при регистрации; вложенный автор (например, в подписке) не трогаем
+        if request and 'users' in request.path and self.parent is None:
             if request.method == 'POST':
                 representation.pop('avatar', None)
                 representation.pop('is_subscribed', None)
@@ -151,8 +190,43 @@ class ChangeProfilePasswordSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+def check_image_header(file):
+    """Проверка размера, формата и сторон изображения по заголовку.
+
+    Pillow читает только заголовок файла, поэтому неподходящее
+    изображение отклоняется до полного декодирования.
+    Возвращает расширение файла по формату.
+    """
+    if file.size > IMAGE_MAX_SIZE:
+        raise serializers.ValidationError(
+            f"Размер изображения больше {IMAGE_MAX_SIZE // 1024 // 1024} МБ."
+        )
+    try:
+        image = Image.open(file)
+        image_format, (width, height) = image.format, image.size
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise serializers.ValidationError(
+            "Загрузите корректное изображение."
+        )
+    finally:
+        file.seek(0)
+    if image_format not in IMAGE_FORMATS:
+        raise serializers.ValidationError(
+            "Неподдерживаемый формат изображения."
+        )
+    if max(width, height) > IMAGE_MAX_SIDE:
+        raise serializers.ValidationError(
+            f"Стороны изображения не должны превышать {IMAGE_MAX_SIDE} пикс."
+        )
+    return IMAGE_FORMATS[image_format]
+
+
 class Base64ImageField(serializers.ImageField):
-    """Кастомное поле для кодирования изображения в base64."""
+    """Изображение в base64 или файлом из multipart/form-data.
+
+    Файлы из multipart сохраняются загрузчиком Django во временный файл,
+    а не читаются в память целиком.
+    """
 
     def to_internal_value(self, data):
         """Метод преобразования картинки."""
@@ -163,10 +237,19 @@ class Base64ImageField(serializers.ImageField):
                 raise serializers.ValidationError(
                     "Неподдерживаемый формат изображения."
                 )
+            # размер проверяется до декодирования строки
+            if len(imgstr) * 3 // 4 > IMAGE_MAX_SIZE:
+                raise serializers.ValidationError(
+                    "Размер изображения больше "
+                    f"{IMAGE_MAX_SIZE // 1024 // 1024} МБ."
+                )
             random_name = uuid.uuid4().hex
             data = ContentFile(
                 base64.b64decode(imgstr), name=f'{random_name}.' + ext
             )
+        if hasattr(data, 'size') and hasattr(data, 'seek'):
+            ext = check_image_header(data)
+            data.name = f'{uuid.uuid4().hex}.{ext}'
 
         return super().to_internal_value(data)
 
@@ -183,7 +266,7 @@ class ProfleAvatarSerializer(serializers.ModelSerializer):
         ]
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериалайзер для модели Tag."""
 
     name = serializers.CharField(read_only=True)
@@ -196,6 +279,7 @@ class TagSerializer(serializers.ModelSerializer):
             'name',
             'slug',
         ]
+        list_serializer_class = TimedListSerializer
 
 
 class IngredientInputSerializer(serializers.ModelSerializer):
@@ -209,7 +293,8 @@ class IngredientInputSerializer(serializers.ModelSerializer):
         fields = ['id', 'amount']
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin,
+                           serializers.ModelSerializer):
     """Сериалайзер для модели Ингредиентов."""
 
     class Meta:
@@ -219,9 +304,10 @@ class IngredientSerializer(serializers.ModelSerializer):
             'name',
             'measurement_unit',
         ]
+        list_serializer_class = TimedListSerializer
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для создания рецептов."""
 
     ingredients = IngredientInputSerializer(many=True, write_only=True)
@@ -250,6 +336,27 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_favorited',
             'is_in_shopping_cart',
         ]
+        list_serializer_class = TimedListSerializer
+
+    def to_internal_value(self, data):
+        """Разбор полей из multipart/form-data.
+
+        Теги передаются повторяющимся полем tags, ингредиенты -
+        json-строкой в поле ingredients.
+        """
+        if isinstance(data, QueryDict):
+            form = data
+            data = form.dict()
+            if 'tags' in form:
+                data['tags'] = form.getlist('tags')
+            if isinstance(data.get('ingredients'), str):
+                try:
+                    data['ingredients'] = json.loads(data['ingredients'])
+                except ValueError:
+                    raise serializers.ValidationError(
+                        {"ingredients": "Ожидается список в формате json."}
+                    )
+        return super().to_internal_value(data)
 
     def validate(self, data):
         """Проверка наличия полей в запросе."""
@@ -273,10 +380,6 @@ class RecipeSerializer(serializers.ModelSerializer):
         for item in value:
             id = item.get("id")
             amount = int(item.get('amount'))
-            if not Ingredient.objects.filter(id=id).exists():
-                raise serializers.ValidationError(
-                    [{"id": f"Ингредиента с id {id} не существует."}]
-                )
             if amount <= AMOUNT_MIN or amount is None:
                 raise serializers.ValidationError(
                     [{"amount": (
@@ -292,7 +395,19 @@ class RecipeSerializer(serializers.ModelSerializer):
                     )}]
                 )
             ids.append(id)
-        ids = []
+
+        # существование всех ингредиентов проверяется одним запросом
+        existing = set(
+            Ingredient.objects.filter(id__in=ids).values_list('id', flat=True)
+        )
+        missing = [id for id in ids if id not in existing]
+        if missing:
+            raise serializers.ValidationError(
+                [{"id": (
+                    "Ингредиентов с id "
+                    f"{', '.join(map(str, missing))} не существует."
+                )}]
+            )
 
         return value
 
@@ -322,29 +437,39 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         return value
 
+    @staticmethod
+    def save_ingredients(recipe, ingredients_data):
+        """Создание связей рецепта с ингредиентами одним запросом."""
+        IngredientRecipe.objects.bulk_create([
+            IngredientRecipe(
+                recipe=recipe,
+                ingredient_id=ingredient_data['id'],
+                amount=ingredient_data['amount']
+            )
+            for ingredient_data in ingredients_data
+        ])
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
 
         user = self.context.get('request').user
         recipe = Recipe.objects.create(**validated_data, author=user)
-
-        for ingredient_data in ingredients_data:
-            ingredient_id = ingredient_data.get('id')
-            amount = ingredient_data.get('amount')
-            ingredient = Ingredient.objects.get(id=ingredient_id)
-            IngredientRecipe.objects.create(
-                recipe=recipe,
-                ingredient=ingredient,
-                amount=amount
-            )
-
+        self.save_ingredients(recipe, ingredients_data)
         recipe.tags.set(tags_data)
         return recipe
 
     def get_ingredients(self, obj):
         """Возвращает список ингредиентов."""
-        ingredient_recipes = IngredientRecipe.objects.filter(recipe=obj)
+        ingredient_recipes = obj.ingredient_links.all()
+        if 'ingredient_links' not in getattr(
+            obj, '_prefetched_objects_cache', {}
+        ):
+            # после создания и изменения рецепта связи не предзагружены
+            ingredient_recipes = ingredient_recipes.select_related(
+                'ingredient'
+            )
         return [
             {
                 'id': ingredient_recipe.ingredient.id,
@@ -357,38 +482,27 @@ class RecipeSerializer(serializers.ModelSerializer):
             for ingredient_recipe in ingredient_recipes
         ]
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Метод обновления модели."""
-        # Удаляем старые связи
+        old_amounts = ingredient_amounts([instance.id])[instance.id]
+        # Заменяем ингредиенты
         instance.ingredients.clear()
-        instance.tags.clear()
-
-        # Обновляем ингредиенты
-        ingredients_data = validated_data.pop('ingredients', [])
-
-        for ingredient_data in ingredients_data:
-            ingredient = Ingredient.objects.filter(
-                id=ingredient_data["id"]
-            ).first()
-            IngredientRecipe.objects.get_or_create(
-                recipe=instance,
-                ingredient=ingredient,
-                amount=ingredient_data["amount"]
-            )
+        self.save_ingredients(
+            instance, validated_data.pop('ingredients', [])
+        )
+        update_recipe_totals(instance.id, old_amounts)
 
         # Обновляем теги
-        tags_data = validated_data.pop('tags', [])
-        tags = []
-        for tag_id in tags_data:
-            tag, created = Tag.objects.get_or_create(name=tag_id)
-            tags.append(tag)
-        instance.tags.set(tags)
+        instance.tags.set(validated_data.pop('tags', []))
 
         # Обновляем остальные поля рецепта
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
         """Преобразование id тегов и ингредиентов в объекты."""
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
         representation = super().to_representation(instance)
         representation['tags'] = TagSerializer(
             instance.tags.all(), many=True
@@ -402,53 +516,67 @@ class RecipeSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
-        return FavoriteRecipes.objects.filter(
-            user=request.user, recipes=obj
-        ).exists()
+        return obj.id in get_request_membership(request).favorites
 
     def get_is_in_shopping_cart(self, obj):
         """Метод проверки на присутствие в корзине."""
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
-        return ShoppingList.objects.filter(
-            user=request.user, recipes=obj
-        ).exists()
+        return obj.id in get_request_membership(request).shopping_cart
+
+
+class RecipeShortSerializer(serializers.ModelSerializer):
+    """Краткое представление рецепта для подписок."""
+
+    image = serializers.ImageField(use_url=True, read_only=True)
+
+    class Meta:
+        model = Recipe
+        fields = [
+            'id',
+            'name',
+            'image',
+            'cooking_time',
+        ]
 
 
 class ShoppingListSerializer(serializers.ModelSerializer):
     """Сериалайзер для модели Списка покупок."""
 
-    recipes = RecipeSerializer(many=True, read_only=True)
+    recipe = RecipeShortSerializer(read_only=True)
     user = UserProfileSerializer(read_only=True)
 
     class Meta:
         model = ShoppingList
         fields = [
             'user',
-            'recipes',
+            'recipe',
+            'created',
         ]
 
 
 class FavoriteRecipesSerializer(serializers.ModelSerializer):
     """Сериалайзер для модели Ибранных рецептов."""
 
-    recipes = RecipeSerializer(many=True, read_only=True)
+    recipe = RecipeShortSerializer(read_only=True)
     user = UserProfileSerializer(read_only=True)
 
     class Meta:
-        model = ShoppingList
+        model = FavoriteRecipes
         fields = [
             'user',
-            'recipes',
+            'recipe',
+            'created',
         ]
 
 
-class SubscribeSerializer(serializers.ModelSerializer):
+class SubscribeSerializer(TimedSerializerMixin,
+                          serializers.ModelSerializer):
     """Сериалайзер для подписок пользователя."""
 
     author = UserProfileSerializer(read_only=True)
-    recipes = RecipeSerializer(many=True, read_only=True)
+    recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField(
         read_only=True
     )
@@ -460,6 +588,7 @@ class SubscribeSerializer(serializers.ModelSerializer):
             'recipes_count',
             'recipes',
         ]
+        list_serializer_class = TimedListSerializer
 
     def validate(self, data):
         # Извлекаем ID пользователя из URL
@@ -485,11 +614,22 @@ class SubscribeSerializer(serializers.ModelSerializer):
         return data
 
     def get_recipes_count(self, instance):
-        """Метод для получения количества рецептов."""
-        return Recipe.objects.filter(author=instance.author).count()
+        """Количество рецептов из счетчика автора."""
+        return instance.author.recipes_count
+
+    def get_recipes(self, instance):
+        """Последние рецепты автора в кратком виде."""
+        recipes = getattr(instance.author, 'feed_recipes', None)
+        if recipes is None:
+            limit = self.context.get('recipes_limit', DEFAULT_RECIPES_LIMIT)
+            recipes = instance.author.recipe.all()[:limit]
+        return RecipeShortSerializer(
+            recipes, many=True, context=self.context
+        ).data
 
     def to_representation(self, instance):
+        """Поля автора выводятся на верхнем уровне."""
+        instance.author.is_subscribed = True
         data = super().to_representation(instance)
-        recipes = Recipe.objects.filter(author=instance.author)[:3]
-        data['recipes'] = RecipeSerializer(recipes, many=True).data
+        data.update(data.pop('author'))
         return data
@@ -0,0 +1,93 @@
+import csv
+import json
+
+from django.db.models import Q
+
+LINES_PER_CHUNK = 500
+CSV_HEADER = ('Ингредиент', 'Количество', 'Единица измерения')
+
+
+class Echo:
+    """Псевдобуфер: csv.writer возвращает строку вместо записи в файл."""
+
+    def write(self, value):
+        return value
+
+
+def chunked(lines, size=LINES_PER_CHUNK):
+    """Объединение строк в блоки, чтобы не отправлять их по одной."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def in_batches(ingredients, size=LINES_PER_CHUNK):
+    """Строки списка покупок пачками по ключу (название, id ингредиента).
+
+    Каждая пачка читается отдельным запросом, а не из открытого
+    курсора, поэтому в режиме ASGI пачки можно читать из разных
+    потоков пула.
+    """
+    ingredients = ingredients.order_by('ingredient__name', 'ingredient_id')
+    batch = list(ingredients[:size])
+    while batch:
+        yield from batch
+        if len(batch) < size:
+            return
+        name, ingredient_id = (
+            batch[-1]['ingredient__name'], batch[-1]['ingredient_id']
+        )
+        batch = list(ingredients.filter(
+            Q(ingredient__name__gt=name)
+            | Q(ingredient__name=name, ingredient_id__gt=ingredient_id)
+        )[:size])
+
+
+def ingredients_to_txt(ingredients):
+    """Список покупок в текстовом виде."""
+    for ingredient in ingredients:
+        yield (
+            f"{ingredient['ingredient__name']}  - "
+            f"{ingredient['amount']}"
+            f"({ingredient['ingredient__measurement_unit']})"
+            "\n"
+        )
+
+
+def ingredients_to_csv(ingredients):
+    """Список покупок в формате csv."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['amount'],
+            ingredient['ingredient__measurement_unit'],
+        ))
+
+
+def ingredients_to_json(ingredients):
+    """Список покупок в виде json-массива."""
+    yield '['
+    separator = ''
+    for ingredient in ingredients:
+        yield separator + json.dumps({
+            'name': ingredient['ingredient__name'],
+            'amount': ingredient['amount'],
+            'measurement_unit': ingredient['ingredient__measurement_unit'],
+        }, ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+EXPORT_FORMATS = {
+    'txt': (ingredients_to_txt, 'text/plain; charset=utf-8'),
+    'csv': (ingredients_to_csv, 'text/csv; charset=utf-8'),
+    'json': (ingredients_to_json, 'application/json; charset=utf-8'),
+}
+DEFAULT_EXPORT_FORMAT = 'txt'
@@ -1,7 +1,9 @@
-from django.urls import include, path
+from django.conf import settings
+from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
-from .views import (ChangeProfilePasswordView, IngredientViewset,
+from .async_views import async_view
+from .views import (ChangeProfilePasswordView, IngredientViewset, MetricsView,
                     ProfileAvatarViewset, RecipeViewset, SubscribeReadViewset,
                     SubscribeWriteViewset, TagViewset, UserProfileViewset)
 
@@ -28,10 +30,38 @@ router_v1.register(
     basename='subscribe'
 )
 
+subscriptions_view = SubscribeReadViewset.as_view({'get': 'list'})
+
+# частые запросы чтения в режиме ASGI; методы те же, что у роутера
+async_urlpatterns = [
+    path('recipes/', async_view(RecipeViewset.as_view(
+        {'get': 'list', 'post': 'create'}, basename='recipes', detail=False
+    ))),
+    path('recipes/download_shopping_cart/', async_view(RecipeViewset.as_view(
+        {'get': 'download_shopping_cart'}, basename='recipes', detail=False
+    ))),
+    re_path(r'^recipes/(?P<pk>[^/.]+)/$', async_view(RecipeViewset.as_view(
+        {
+            'get': 'retrieve',
+            'put': 'update',
+            'patch': 'partial_update',
+            'delete': 'destroy',
+        },
+        basename='recipes', detail=True
+    ))),
+    path('ingredients/', async_view(IngredientViewset.as_view(
+        {'get': 'list', 'post': 'create'}, basename='ingredients',
+        detail=False
+    ))),
+]
+
 urlpatterns = [
-    path('users/subscriptions/', SubscribeReadViewset.as_view(
-        {'get': 'list'}
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('users/subscriptions/', (
+        async_view(subscriptions_view) if settings.ASYNC_VIEWS
+        else subscriptions_view
     ), name='subscriptions'),
+    *(async_urlpatterns if settings.ASYNC_VIEWS else ()),
     path('auth/', include('djoser.urls.authtoken')),
     path(
         'users/set_password/',
@@ -1,29 +1,43 @@
 import os
 
 from django.contrib.auth.hashers import check_password
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import IntegrityError, transaction
+from django.db.models import (Exists, OuterRef, Prefetch,
+                              prefetch_related_objects)
+from django.http import (Http404, HttpResponse, HttpResponseRedirect,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import (LimitOffsetPagination,
-                                       PageNumberPagination)
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
 from .filters import RecipeFilter
+from .metrics import registry
+from .mixins import CachedCatalogMixin, CachedRecipeMixin, ReplicaReadMixin
+from .pagination import RecipePagination
 from .permissions import IfMeAuthenticated, RecipePermission
-from .serializers import (IngredientSerializer, ProfleAvatarSerializer,
-                          RecipeSerializer, SubscribeSerializer, TagSerializer,
+from .serializers import (DEFAULT_RECIPES_LIMIT, IngredientSerializer,
+                          ProfleAvatarSerializer, RecipeSerializer,
+                          SubscribeSerializer, TagSerializer,
                           UserProfileSerializer)
+from .shopping_cart import (DEFAULT_EXPORT_FORMAT, EXPORT_FORMATS, chunked,
+                            in_batches)
 from core.models import Subscribe, User
-from recipe.models import (FavoriteRecipes, Ingredient, IngredientRecipe,
-                           Recipe, ShoppingList, Tag)
+from recipe.catalog import INGREDIENTS, TAGS
+from recipe.models import (FavoriteRecipes, Ingredient, Recipe, ShoppingList,
+                           ShoppingListIngredient, Tag)
+from recipe.search import ingredient_index
+from recipe.services import add_recipe_link, remove_recipe_link
+from recipe.shortlinks import decode, encode, short_links
 
 
-class UserProfileViewset(viewsets.ModelViewSet):
+class UserProfileViewset(ReplicaReadMixin, viewsets.ModelViewSet):
     """Вьюсет для работы со страницей пользователей."""
 
     serializer_class = UserProfileSerializer
@@ -80,11 +94,35 @@ class ChangeProfilePasswordView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class MetricsView(APIView):
+    """Метрики запросов в текстовом формате Prometheus."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return HttpResponse(
+            registry.render(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
+
+
+def short_link_redirect(request, code):
+    """Переход по короткой ссылке на страницу рецепта.
+
+    При попадании в карту коротких ссылок база не используется.
+    """
+    recipe_id = decode(code)
+    if recipe_id is None or not short_links.exists(recipe_id):
+        raise Http404('Рецепт не найден.')
+    return HttpResponseRedirect(f'/recipes/{recipe_id}')
+
+
 class ProfileAvatarViewset(viewsets.GenericViewSet):
     """Вьюсет для работы с аватаром пользователя."""
 
     serializer_class = ProfleAvatarSerializer
     permission_classes = (IsAuthenticated,)
+    parser_classes = (JSONParser, MultiPartParser, FormParser)
     http_method_names = ['put', 'delete']
 
     def update(self, request, *args, **kwargs):
@@ -115,9 +153,11 @@ class ProfileAvatarViewset(viewsets.GenericViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewset(viewsets.ModelViewSet):
+class TagViewset(ReplicaReadMixin, CachedCatalogMixin,
+                 viewsets.ModelViewSet):
     """Вьюсет для тегов."""
 
+    catalog = TAGS
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = ()
@@ -125,22 +165,25 @@ class TagViewset(viewsets.ModelViewSet):
     queryset = Tag.objects.all()
 
 
-class RecipeViewset(viewsets.ModelViewSet):
+class RecipeViewset(ReplicaReadMixin, CachedRecipeMixin,
+                    viewsets.ModelViewSet):
     """Вьюсет для рецептов."""
 
     permission_classes = (RecipePermission,)
     http_method_names = ('get', 'post', 'patch', 'delete')
-    filter_backends = (filters.SearchFilter, DjangoFilterBackend)
-    search_fields = ('tags', 'author')
+    filter_backends = (DjangoFilterBackend,)
     filterset_fields = [
         'author',
         'tags',
         'is_in_shopping_cart',
-        'is_favorited'
+        'is_favorited',
+        'search',
+        'ordering',
     ]
     filterset_class = RecipeFilter
     serializer_class = RecipeSerializer
-    pagination_class = PageNumberPagination
+    pagination_class = RecipePagination
+    parser_classes = (JSONParser, MultiPartParser, FormParser)
 
     def get_serializer_context(self):
         """Метод для передачи контекста."""
@@ -149,47 +192,53 @@ class RecipeViewset(viewsets.ModelViewSet):
         return context
 
     def get_queryset(self):
-        queryset = Recipe.objects.all()
+        queryset = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            'ingredient_links__ingredient',
+        )
         author = self.request.query_params.get('author')
         if author:
             queryset = queryset.filter(author=author)
+        user = self.request.user
+        if user.is_authenticated:
+            # Флаги избранного и корзины берутся из кешированных наборов
+            # пользователя (recipe.membership), подписка - подзапросом.
+            queryset = queryset.annotate(
+                author_is_subscribed=Exists(Subscribe.objects.filter(
+                    subscriber=user, author=OuterRef('author')
+                )),
+            )
         return queryset
 
     @action(detail=True, methods=['get'], url_path='get-link')
     def get_link(self, request, pk=None):
-        """Ссылка на рецепт."""
-        try:
-            recipe = self.get_object()
-            link = request.build_absolute_uri(
-                f"/api/recipes/{recipe.id}/get-link/"
-            )
-            return Response({"short-link": link}, status=status.HTTP_200_OK)
-        except Recipe.DoesNotExist:
+        """Короткая ссылка на рецепт без загрузки и сериализации."""
+        if not str(pk).isdigit() or not short_links.exists(int(pk)):
             return Response(
                 {"detail": "Recipe not found."},
                 status=status.HTTP_404_NOT_FOUND,
             )
-
-    @action(detail=True, methods=['post', 'delete'], url_path='shopping_cart')
-    def add_to_shopping_cart(self, request, pk=None):
-        """Добавление рецепта в список покупок."""
+        link = request.build_absolute_uri(f'/s/{encode(int(pk))}')
+        return Response({"short-link": link}, status=status.HTTP_200_OK)
+
+    def toggle_recipe_link(self, model, request, pk, exists_message,
+                           missing_message):
+        """Добавление или удаление связи пользователя с рецептом.
+
+        model - FavoriteRecipes или ShoppingList: одна строка на пару
+        (пользователь, рецепт). Ответ определяется числом добавленных
+        или удаленных строк, поэтому повторные и одновременные запросы
+        не приводят к дублям и ошибкам 500.
+        """
         recipe = get_object_or_404(Recipe, id=pk)
         user = request.user
 
         if request.method == 'POST':
-
-            shopping_list, created = ShoppingList.objects.get_or_create(
-                user=user
-            )
-
-            if shopping_list.recipes.filter(id=recipe.id).exists():
+            if not add_recipe_link(model, user.id, recipe.id):
                 return Response(
-                    {"detail": "Рецепт уже в корзине."},
+                    {'detail': exists_message},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-
-            shopping_list.recipes.add(recipe)
-
             return Response({
                 'id': recipe.id,
                 'name': recipe.name,
@@ -197,114 +246,110 @@ class RecipeViewset(viewsets.ModelViewSet):
                 'cooking_time': recipe.cooking_time,
             }, status=status.HTTP_201_CREATED)
 
-        elif request.method == 'DELETE':
-
-            shopping_list = ShoppingList.objects.filter(user=user).first()
-
-            if not shopping_list:
-                return Response(
-                    {'detail': 'Список покупок пуст.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            if not shopping_list.recipes.filter(id=recipe.id).exists():
-                return Response(
-                    {'detail': 'Рецепта нет в корзине.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            shopping_list.recipes.remove(recipe)
-            return Response(status=status.HTTP_204_NO_CONTENT)
-
-    @staticmethod
-    def ingredients_to_txt(ingredients):
-        """Метод для объединения ингредиентов в список для загрузки."""
-        shopping_list = ''
-        for ingredient in ingredients:
-            shopping_list += (
-                f"{ingredient['ingredient__name']}  - "
-                f"{ingredient['sum']}"
-                f"({ingredient['ingredient__measurement_unit']})"
-                "\n"
+        if not remove_recipe_link(model, user.id, recipe.id):
+            return Response(
+                {'detail': missing_message},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        return shopping_list
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=['post', 'delete'], url_path='shopping_cart')
+    def add_to_shopping_cart(self, request, pk=None):
+        """Добавление рецепта в список покупок."""
+        return self.toggle_recipe_link(
+            ShoppingList, request, pk,
+            'Рецепт уже в корзине.',
+            'Рецепта нет в корзине.'
+        )
 
     @action(detail=False, methods=['get'], url_path='download_shopping_cart')
     def download_shopping_cart(self, request):
-        """Метод для загрузки ингредиентов."""
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__shopping_list__user=request.user
+        """Метод для загрузки ингредиентов.
+
+        Формат выбирается параметром file_format: txt, csv или json.
+        Строки читаются пачками и отдаются потоком, поэтому память
+        не зависит от размера корзины.
+        """
+        file_format = request.query_params.get(
+            'file_format', DEFAULT_EXPORT_FORMAT
+        )
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {'file_format': (
+                    'Допустимые форматы: '
+                    f'{", ".join(EXPORT_FORMATS)}.'
+                )},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        writer, content_type = EXPORT_FORMATS[file_format]
+        # суммы поддерживаются при изменении списка покупок,
+        # поэтому выгрузка - это одно чтение по индексу пользователя
+        ingredients = ShoppingListIngredient.objects.filter(
+            user=request.user
         ).values(
+            'ingredient_id',
             'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(sum=Sum('amount'))
-        shopping_list = self.ingredients_to_txt(ingredients)
-        return HttpResponse(shopping_list, content_type='text/plain')
+            'ingredient__measurement_unit',
+            'amount',
+        )
+        response = StreamingHttpResponse(
+            chunked(writer(in_batches(ingredients))),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{file_format}"'
+        )
+        return response
 
     @action(detail=True, methods=['post', 'delete'], url_path='favorite')
     def add_or_remove_favorite(self, request, pk=None):
         """Добавление рецепта в избранное."""
-        recipe = get_object_or_404(Recipe, id=pk)
-        user = request.user
-        # Получаем или создаем список покупок для пользователя
-        if request.method == 'POST':
-            favorite, created = FavoriteRecipes.objects.get_or_create(
-                user=user
-            )
-
-            # Проверяем, есть ли уже рецепт в списке
-            if favorite.recipes.filter(id=recipe.id).exists():
-                return Response(
-                    {"detail": "Рецепт уже в избранном."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            # Добавляем рецепт в список покупок
-            favorite.recipes.add(recipe)
-
-            return Response({
-                'id': recipe.id,
-                'name': recipe.name,
-                'image': request.build_absolute_uri(recipe.image.url),
-                'cooking_time': recipe.cooking_time,
-            }, status=status.HTTP_201_CREATED)
-
-        elif request.method == 'DELETE':
-
-            favorite = FavoriteRecipes.objects.filter(user=user).first()
-
-            if not favorite:
-                return Response(
-                    {'detail': 'Список покупок пуст.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            if not favorite.recipes.filter(id=recipe.id).exists():
-                return Response(
-                    {'detail': 'Рецепта нет в корзине.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            favorite.recipes.remove(recipe)
-            return Response(status=status.HTTP_204_NO_CONTENT)
+        return self.toggle_recipe_link(
+            FavoriteRecipes, request, pk,
+            'Рецепт уже в избранном.',
+            'Рецепта нет в избранном.'
+        )
 
 
-class IngredientViewset(viewsets.ModelViewSet):
+class IngredientViewset(ReplicaReadMixin, CachedCatalogMixin,
+                        viewsets.ModelViewSet):
     """Вьюсет для ингредиентов."""
 
+    catalog = INGREDIENTS
     serializer_class = IngredientSerializer
     pagination_class = None
     permission_classes = ()
     http_method_names = ('get')
-    filter_backends = (filters.SearchFilter,)
-    # fix field param
-    search_fields = ('name',)
     queryset = Ingredient.objects.all()
 
+    def list_data(self, request):
+        """Список ингредиентов или автодополнение по названию."""
+        name = request.query_params.get(api_settings.SEARCH_PARAM)
+        if not name:
+            return super().list_data(request)
+        return ingredient_index.search(name)
+
     def get_object(self):
         id = self.kwargs.get('pk')
         return get_object_or_404(Ingredient, id=id)
 
 
-class SubscribeWriteViewset(viewsets.ModelViewSet):
+class RecipesLimitMixin:
+    """Передача параметра recipes_limit в контекст сериалайзера."""
+
+    def get_recipes_limit(self):
+        limit = self.request.query_params.get('recipes_limit')
+        if limit is not None and limit.isdigit():
+            return int(limit)
+        return DEFAULT_RECIPES_LIMIT
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['recipes_limit'] = self.get_recipes_limit()
+        return context
+
+
+class SubscribeWriteViewset(RecipesLimitMixin, viewsets.ModelViewSet):
     """Вьюсет для управлением подписками пользователя."""
 
     serializer_class = SubscribeSerializer
@@ -312,50 +357,44 @@ class SubscribeWriteViewset(viewsets.ModelViewSet):
     http_method_names = ('post', 'delete')
 
     def create(self, request, author_id=None):
-        """Добавить рецепт в избранное."""
+        """Подписаться на автора.
+
+        Подписка и счетчик подписчиков автора меняются в одной
+        транзакции; повторная подписка отклоняется ограничением
+        уникальности.
+        """
         author = get_object_or_404(User, id=author_id)
         user = request.user
-        if Subscribe.objects.filter(subscriber=user, author=author).exists():
+        try:
+            with transaction.atomic():
+                subscription = Subscribe.objects.create(
+                    subscriber=user, author=author
+                )
+        except IntegrityError:
             return Response({'detail': 'Вы уже подписаны на этого автора.'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        subscription = Subscribe.objects.create(
-            subscriber=user, author=author
-        )
-
-        serializer = SubscribeSerializer(subscription)
-        serializer_data = serializer.data
-        author_object = serializer_data.pop("author")
-        recipes = serializer_data.pop('recipes')
-        modify_recipes = []
-        for recipe in recipes:
-            modify_recipes.append({
-                "id": recipe['id'],
-                "name": recipe["name"],
-                "image": recipe["image"],
-                "cooking_time": recipe["cooking_time"],
-            })
-        serializer_data.update(author_object)
-        serializer_data.update({"recipes": modify_recipes})
-
-        return Response(serializer_data, status=status.HTTP_201_CREATED)
+        serializer = self.get_serializer(subscription)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(methods=['delete'], detail=True, url_path='subscribe')
     def delete(self, request, author_id=None):
-        """Удалить рецепт из избранного."""
+        """Отписаться от автора."""
         author = get_object_or_404(User, id=author_id)
         user = request.user
 
-        subscribe = Subscribe.objects.filter(subscriber=user, author=author)
-        if not subscribe.exists():
+        with transaction.atomic():
+            deleted, _ = Subscribe.objects.filter(
+                subscriber=user, author=author
+            ).delete()
+        if not deleted:
             return Response({'detail': 'Вы не подписаны на этого автора.'},
                             status=status.HTTP_400_BAD_REQUEST)
-
-        subscribe.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class SubscribeReadViewset(viewsets.ModelViewSet):
+class SubscribeReadViewset(ReplicaReadMixin, RecipesLimitMixin,
+                           viewsets.ModelViewSet):
     """Вьюсет вывода списка подписок."""
 
     serializer_class = SubscribeSerializer
@@ -364,27 +403,28 @@ class SubscribeReadViewset(viewsets.ModelViewSet):
     http_method_names = ('get')
 
     def get_queryset(self):
-
-        return Subscribe.objects.filter(subscriber=self.request.user)
+        return Subscribe.objects.filter(
+            subscriber=self.request.user
+        ).select_related('author').order_by('id')
+
+    def prefetch_recipes(self, subscriptions):
+        """Последние рецепты всех авторов страницы одним запросом.
+
+        Для каждого рецепта проверяется, входит ли он в первые
+        recipes_limit рецептов своего автора (коррелированный подзапрос).
+        """
+        latest = Recipe.objects.filter(
+            author=OuterRef('author')
+        ).values('id')[:self.get_recipes_limit()]
+        prefetch_related_objects(subscriptions, Prefetch(
+            'author__recipe',
+            queryset=Recipe.objects.filter(id__in=latest),
+            to_attr='feed_recipes'
+        ))
 
     def list(self, request, *args, **kwargs):
         """Вывод списка подписок."""
-        queryset = self.get_queryset()
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            serialized_data = serializer.data
-        for item in serialized_data:
-            results_author = item.pop('author')
-            results_recipes = item.pop('recipes')
-            recipes = []
-            for recipe in results_recipes:
-                recipes.append({
-                    "id": recipe['id'],
-                    "name": recipe["name"],
-                    "image": recipe["image"],
-                    "cooking_time": recipe["cooking_time"],
-                })
-            item.update(results_author)
-            item.update({"recipes": recipes})
-        return self.get_paginated_response(serialized_data)
+        page = self.paginate_queryset(self.get_queryset())
+        self.prefetch_recipes(page)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
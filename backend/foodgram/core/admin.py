@@ -1,14 +1,57 @@
 from django.contrib import admin
 from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections, transaction
 from django.forms import BaseInlineFormSet
+from django.utils.functional import cached_property
 
 from core.models import Subscribe, User
 from recipe.models import (FavoriteRecipes, Ingredient, IngredientRecipe,
                            Recipe, ShoppingList, Tag)
+from recipe.services import ingredient_amounts, update_recipe_totals
+
+# ниже этого числа строк статистике Postgres не доверяем
+ESTIMATED_COUNT_MIN = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор списков админки с оценкой числа строк.
+
+    Для списка без фильтров и поиска в Postgres число строк берется
+    из статистики таблицы (pg_class.reltuples) вместо COUNT(*)
+    по всей таблице. Для небольших таблиц и отфильтрованных списков
+    считается точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= ESTIMATED_COUNT_MIN:
+                return int(row[0])
+        return super().count
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Общие настройки списков для больших таблиц.
+
+    Оценка числа строк вместо COUNT(*) и без второго подсчета
+    всех строк таблицы при поиске и фильтрах.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(ScalableAdmin):
     """Админка пользователей."""
 
     list_display = (
@@ -17,6 +60,8 @@ class UserAdmin(admin.ModelAdmin):
         'email',
         'first_name',
         'last_name',
+        'recipes_count',
+        'subscribers_count',
         'is_superuser'
     )
     list_filter = ('is_superuser', 'is_staff', 'is_active')
@@ -38,12 +83,17 @@ class UserAdmin(admin.ModelAdmin):
 
 
 @admin.register(Subscribe)
-class SubscribeAdmin(admin.ModelAdmin):
-    """Админка подписок."""
+class SubscribeAdmin(ScalableAdmin):
+    """Админка подписок.
+
+    Фильтр по автору выводил бы всех пользователей, поэтому автор
+    ищется через поиск, а в форме выбирается автодополнением.
+    """
 
     list_display = ('id', 'subscriber', 'author')
-    list_filter = ('author',)
+    list_select_related = ('subscriber', 'author')
     search_fields = ('subscriber__username', 'author__username')
+    autocomplete_fields = ('subscriber', 'author')
 
 
 class IngredientRecipeInlineFormset(BaseInlineFormSet):
@@ -66,29 +116,46 @@ class RecipeIngredientInline(admin.TabularInline):
     model = IngredientRecipe
     extra = 1
     formset = IngredientRecipeInlineFormset
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        """Строки выводятся через __str__ с ингредиентом и рецептом."""
+        return super().get_queryset(request).select_related(
+            'ingredient', 'recipe'
+        )
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
-    """Админка рецептов."""
+class RecipeAdmin(ScalableAdmin):
+    """Админка рецептов.
+
+    Счетчики избранного и списков покупок - столбцы рецепта, автор
+    подгружается в том же запросе; автор и теги в форме выбираются
+    автодополнением.
+    """
 
     list_display = (
         'id',
         'name',
         'author',
         'cooking_time',
-        'favorites_count'
+        'favorites_count',
+        'shopping_cart_count',
     )
-    list_filter = ('author', 'tags')
+    list_select_related = ('author',)
+    list_filter = ('tags',)
     search_fields = ('name', 'author__username')
-    filter_horizontal = ('tags',)
+    autocomplete_fields = ('author', 'tags')
     ordering = ('id',)
     inlines = [RecipeIngredientInline]
 
-    def favorites_count(self, obj):
-        """Подсчет количества добавлений рецепта в избранное."""
-        return obj.favorited.count()
-    favorites_count.short_description = "В избранном"
+    @transaction.atomic
+    def save_related(self, request, form, formsets, change):
+        """Пересчет списков покупок после изменения ингредиентов."""
+        recipe_id = form.instance.id
+        old_amounts = ingredient_amounts([recipe_id])[recipe_id]
+        super().save_related(request, form, formsets, change)
+        update_recipe_totals(recipe_id, old_amounts)
 
 
 @admin.register(Tag)
@@ -100,7 +167,7 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(ScalableAdmin):
     """Админка ингредиентов."""
 
     list_display = ('id', 'name', 'measurement_unit')
@@ -108,27 +175,30 @@ class IngredientAdmin(admin.ModelAdmin):
     list_filter = ('measurement_unit',)
 
 
-@admin.register(FavoriteRecipes)
-class FavoriteRecipesAdmin(admin.ModelAdmin):
-    """Админка избранных рецептов."""
+class UserRecipeAdmin(ScalableAdmin):
+    """Общая админка связей пользователя с рецептом."""
 
-    list_display = ('id', 'user', 'recipes_count')
-    filter_horizontal = ('recipes',)
+    list_display = ('id', 'user', 'recipe', 'created')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
 
-    def recipes_count(self, obj):
-        """Подсчет количества рецептов в избранном."""
-        return obj.recipes.count()
-    recipes_count.short_description = "Количество рецептов"
+    def get_readonly_fields(self, request, obj=None):
+        """Связь не меняется, а удаляется и создается заново.
 
+        Суммы списков покупок пересчитываются только при добавлении
+        и удалении строки.
+        """
+        if obj is not None:
+            return ('user', 'recipe')
+        return ()
 
-@admin.register(ShoppingList)
-class ShoppingListAdmin(admin.ModelAdmin):
-    """Админка списка покупок."""
 
-    list_display = ('id', 'user', 'recipes_count')
-    filter_horizontal = ('recipes',)
+@admin.register(FavoriteRecipes)
+class FavoriteRecipesAdmin(UserRecipeAdmin):
+    """Админка избранных рецептов."""
+
 
-    def recipes_count(self, obj):
-        """Подсчет количества рецептов в списке покупок."""
-        return obj.recipes.count()
-    recipes_count.short_description = "Количество рецептов"
+@admin.register(ShoppingList)
+class ShoppingListAdmin(UserRecipeAdmin):
+    """Админка списка покупок."""
@@ -0,0 +1,153 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+SHARED_TIMEOUT = 60 * 60
+
+
+def _shared_key(key):
+    return f'auth:token:{key}'
+
+
+def _generation_key(key):
+    return f'auth:token:{key}:generation'
+
+
+def current_generation(key):
+    """Поколение токена в общем кеше Django.
+
+    Сброс токена удаляет его поколение, и при следующем обращении
+    создается новое. Записи кешей с прежним поколением после этого
+    не принимаются ни в одном процессе. Потеря ключа при вытеснении
+    из кеша тоже дает новое поколение, то есть лишний запрос к базе,
+    а не устаревший токен.
+    """
+    generation_key = _generation_key(key)
+    generation = cache.get(generation_key)
+    if generation is None:
+        cache.add(generation_key, uuid4().hex, SHARED_TIMEOUT)
+        generation = cache.get(generation_key)
+    return generation
+
+
+class TokenCache:
+    """Ограниченный LRU-кеш токенов в памяти процесса со сроком жизни.
+
+    Запись принимается, только пока совпадает поколение токена
+    в общем кеше: так до записей других процессов доходят сбросы,
+    которые не видны сигналам этого процесса.
+    """
+
+    def __init__(self, max_size, ttl):
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self.max_size = max_size
+        self.ttl = ttl
+
+    def get(self, key, generation):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            token, token_generation, expires = item
+            if token_generation != generation or expires < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return token
+
+    def set(self, key, token, generation):
+        with self._lock:
+            self._items[key] = (
+                token, generation, time.monotonic() + self.ttl
+            )
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._items.pop(key, None)
+
+    def user_keys(self, user_id):
+        with self._lock:
+            return [
+                key for key, (token, *_) in self._items.items()
+                if token.user_id == user_id
+            ]
+
+
+token_cache = TokenCache(
+    settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL
+)
+
+
+def invalidate_tokens(keys):
+    """Сброс токенов во всех процессах.
+
+    Записи этого процесса удаляются сразу, а поколения в общем кеше -
+    после фиксации транзакции: иначе параллельный запрос успел бы
+    закешировать еще не измененные данные под новым поколением.
+    """
+    keys = list(keys)
+    if not keys:
+        return
+    token_cache.delete(keys)
+    shared_keys = [_generation_key(key) for key in keys]
+    if settings.AUTH_TOKEN_SHARED_CACHE:
+        shared_keys += [_shared_key(key) for key in keys]
+    transaction.on_commit(lambda: cache.delete_many(shared_keys))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к базе на каждый вызов.
+
+    Токен с пользователем берется из кеша процесса, затем, при
+    AUTH_TOKEN_SHARED_CACHE, из общего кеша Django и только потом
+    из базы. Записи сбрасываются при удалении токена (выход,
+    смена пароля в djoser) и при сохранении пользователя (смена
+    пароля, деактивация, изменение профиля). Поколение токена
+    читается из общего кеша при каждом запросе и до чтения из базы,
+    поэтому сброс сразу виден всем процессам.
+    """
+
+    def authenticate_credentials(self, key):
+        generation = current_generation(key)
+        token = token_cache.get(key, generation)
+        if token is None and settings.AUTH_TOKEN_SHARED_CACHE:
+            entry = cache.get(_shared_key(key))
+            if entry is not None and entry[1] == generation:
+                token = entry[0]
+                token_cache.set(key, token, generation)
+        if token is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if token.user.is_active:
+                token_cache.set(key, token, generation)
+                if settings.AUTH_TOKEN_SHARED_CACHE:
+                    cache.set(
+                        _shared_key(key), (token, generation), SHARED_TIMEOUT
+                    )
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        # у каждого запроса своя копия: объект из кеша общий
+        # для потоков процесса
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return (token.user, token)
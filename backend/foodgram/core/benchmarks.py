@@ -0,0 +1,61 @@
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test.utils import (override_settings, setup_databases,
+                               setup_test_environment, teardown_databases,
+                               teardown_test_environment)
+
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }
+}
+
+
+def add_database_arguments(parser):
+    """Ключи выбора базы для замеров, которые создают и удаляют данные."""
+    parser.add_argument(
+        '--allow-writes', action='store_true',
+        help='писать временные данные в настроенную базу; по умолчанию '
+             'замер идет во временной тестовой базе'
+    )
+    parser.add_argument(
+        '--keepdb', action='store_true',
+        help='не удалять тестовую базу после замера'
+    )
+
+
+@contextmanager
+def benchmark_environment(options):
+    """Окружение замера, изменяющего данные.
+
+    По умолчанию создается тестовая база, как у manage.py test (нужно
+    право CREATEDB), кеш в памяти процесса и временная папка
+    медиафайлов: замер не трогает рабочую базу, общий кеш и файлы.
+    С --allow-writes замер идет в настроенной базе.
+    """
+    if options['allow_writes']:
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+        ):
+            yield
+        return
+    verbosity = options['verbosity']
+    setup_test_environment()
+    try:
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            CACHES=BENCHMARK_CACHES, MEDIA_ROOT=media_root
+        ):
+            old_config = setup_databases(
+                verbosity, interactive=False, keepdb=options['keepdb']
+            )
+            try:
+                yield
+            finally:
+                teardown_databases(
+                    old_config, verbosity, keepdb=options['keepdb']
+                )
+    finally:
+        teardown_test_environment()
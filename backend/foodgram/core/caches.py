@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.core.checks import Error, Tags, register
+
+# кеши, которые видит только текущий процесс
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared_cache(alias=DEFAULT_CACHE_ALIAS):
+    """Виден ли кеш всем процессам: воркерам и командам manage.py."""
+    return settings.CACHES[alias]['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def version_timeout():
+    """Срок жизни ключей версий в кеше.
+
+    В общем кеше версия меняется сразу во всех процессах и хранится
+    бессрочно. Кеш в памяти процесса не видит смену версии в других
+    процессах (админка в другом воркере, команды manage.py), поэтому
+    там версия живет LOCAL_CACHE_VERSION_TIMEOUT секунд и устаревшие
+    данные читаются не дольше этого срока.
+    """
+    if is_shared_cache():
+        return None
+    return settings.LOCAL_CACHE_VERSION_TIMEOUT
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Несколько воркеров требуют общего кеша.
+
+    Версии наборов избранного и корзины, справочников и флаг чтения
+    из основной базы должны меняться сразу во всех воркерах.
+    """
+    if settings.WEB_CONCURRENCY > 1 and not is_shared_cache():
+        return [Error(
+            f'WEB_CONCURRENCY={settings.WEB_CONCURRENCY}, а кеш '
+            f'{settings.CACHES[DEFAULT_CACHE_ALIAS]["BACKEND"]} '
+            'виден только своему процессу.',
+            hint='Задайте общий кеш в CACHE_BACKEND и CACHE_LOCATION.',
+            id='core.E001',
+        )]
+    return []
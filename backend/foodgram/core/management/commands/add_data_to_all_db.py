@@ -180,16 +180,16 @@ class Command(BaseCommand):
             user_objects = User.objects.all()
 
             ShoppingList.objects.create(
-                user=user_objects[0]).recipes.add(
-                    Recipe.objects.get(name="Омлет с сыром")
+                user=user_objects[0],
+                recipe=Recipe.objects.get(name="Омлет с сыром")
             ),
             ShoppingList.objects.create(
-                user=user_objects[1]).recipes.add(
-                    Recipe.objects.get(name="Картофельное пюре")
+                user=user_objects[1],
+                recipe=Recipe.objects.get(name="Картофельное пюре")
             ),
             ShoppingList.objects.create(
-                user=user_objects[2]).recipes.add(
-                    Recipe.objects.get(name="Суп из моркови")
+                user=user_objects[2],
+                recipe=Recipe.objects.get(name="Суп из моркови")
             ),
 
             print(f"Создано списков покупок: {ShoppingList.objects.count()}")
@@ -198,24 +198,17 @@ class Command(BaseCommand):
             print('Не удалось ', e)
         try:
             user_objects = User.objects.all()
-            favorite_recipe_1 = FavoriteRecipes.objects.create(
-                user=user_objects[0]
+            FavoriteRecipes.objects.create(
+                user=user_objects[0],
+                recipe=Recipe.objects.get(name="Картофельное пюре")
             )
-            favorite_recipe_2 = FavoriteRecipes.objects.create(
-                user=user_objects[1]
+            FavoriteRecipes.objects.create(
+                user=user_objects[1],
+                recipe=Recipe.objects.get(name="Суп из моркови")
             )
-            favorite_recipe_3 = FavoriteRecipes.objects.create(
-                user=user_objects[2]
-            )
-
-            favorite_recipe_1.recipes.add(
-                Recipe.objects.get(name="Картофельное пюре")
-            )
-            favorite_recipe_2.recipes.add(
-                Recipe.objects.get(name="Суп из моркови")
-            )
-            favorite_recipe_3.recipes.add(
-                Recipe.objects.get(name="Омлет с сыром")
+            FavoriteRecipes.objects.create(
+                user=user_objects[2],
+                recipe=Recipe.objects.get(name="Омлет с сыром")
             )
             print(
                 "Создано избранных рецептов: ",
@@ -1,29 +1,197 @@
+import csv
+import io
 import json
+import os
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
-from recipe.models import Ingredient, Tag
+from recipe.catalog import INGREDIENTS, TAGS, bump_catalog_version
+from recipe.models import CHAR_MAX_LENGTH, Ingredient, Tag
+
+DEFAULT_PATH = 'data/ingredients.json'
+READ_SIZE = 64 * 1024
+TAGS_DATA = (
+    ('Завтрак', 'morning'),
+    ('Обед', 'lunch'),
+    ('Ужин', 'evening'),
+)
+
+
+def iter_json_array(file):
+    """Объекты json-массива по одному, без чтения файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    while True:
+        chunk = file.read(READ_SIZE)
+        buffer += chunk
+        while True:
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    break
+                if buffer[0] != '[':
+                    raise CommandError('Ожидается json-массив объектов.')
+                buffer = buffer[1:]
+                started = True
+                continue
+            buffer = buffer.lstrip(', \t\r\n')
+            if buffer.startswith(']'):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise CommandError('Файл json поврежден.')
+                break
+            buffer = buffer[end:]
+            yield item
+        if not chunk:
+            raise CommandError('Файл json оборвался.')
+
+
+def iter_csv(file):
+    """Строки csv вида name,measurement_unit (заголовок необязателен)."""
+    for row in csv.reader(file):
+        if row == ['name', 'measurement_unit']:
+            continue
+        yield {
+            'name': row[0] if row else '',
+            'measurement_unit': row[1] if len(row) > 1 else '',
+        }
 
 
 class Command(BaseCommand):
-    help = "Load ingredients data from JSON file"
+    help = (
+        'Загружает справочник ингредиентов из json или csv пачками '
+        'и создает теги. Повторный запуск добавляет только новые записи'
+    )
 
-    def handle(self, *args, **kwargs):
-        with open("data/ingredients.json", "r", encoding="utf-8") as file:
-            data = json.load(file)
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=DEFAULT_PATH,
+            help='файл json (массив объектов) или csv'
+        )
+        parser.add_argument(
+            '--format', choices=('json', 'csv'),
+            help='формат файла, по умолчанию - по расширению'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
 
-        ingredients = [
-            Ingredient(
-                name=item["name"],
-                measurement_unit=item["measurement_unit"]
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'json'
+        )
+        if not os.path.exists(path):
+            raise CommandError(f'Файл {path} не найден.')
+        self.counts = {'inserted': 0, 'existing': 0, 'invalid': 0}
+        with open(path, 'r', encoding='utf-8', newline='') as file:
+            items = (
+                iter_csv(file) if file_format == 'csv'
+                else iter_json_array(file)
             )
-            for item in data
-        ]
+            while True:
+                batch = list(islice(items, options['batch_size']))
+                if not batch:
+                    break
+                self.load_batch(batch)
+                self.stdout.write(
+                    f'Обработано: {sum(self.counts.values())}, '
+                    f'добавлено: {self.counts["inserted"]}, '
+                    f'уже были: {self.counts["existing"]}, '
+                    f'с ошибками: {self.counts["invalid"]}'
+                )
+        tags_created = sum(
+            Tag.objects.get_or_create(slug=slug, defaults={'name': name})[1]
+            for name, slug in TAGS_DATA
+        )
+        # вставка идет в обход сигналов модели, версию меняем явно
+        bump_catalog_version(INGREDIENTS, TAGS)
+        self.stdout.write(f'Создано тегов: {tags_created}')
+        self.stdout.write(self.style.SUCCESS('Ингредиенты успешно загружены.'))
+
+    def clean_batch(self, batch):
+        """Уникальные пары (name, measurement_unit) из корректных строк."""
+        rows = {}
+        for item in batch:
+            if not isinstance(item, dict):
+                self.counts['invalid'] += 1
+                continue
+            name = str(item.get('name') or '').strip()
+            unit = str(item.get('measurement_unit') or '').strip()
+            if (
+                not name or not unit
+                or len(name) > CHAR_MAX_LENGTH
+                or len(unit) > CHAR_MAX_LENGTH
+            ):
+                self.counts['invalid'] += 1
+                continue
+            if (name, unit) in rows:
+                self.counts['existing'] += 1
+                continue
+            rows[(name, unit)] = None
+        return list(rows)
 
-        Ingredient.objects.bulk_create(ingredients, ignore_conflicts=True)
+    def load_batch(self, batch):
+        """Вставка пачки в отдельной короткой транзакции.
 
-        Tag.objects.create(name="Завтрак", slug='morning')
-        Tag.objects.create(name="Обед", slug='lunch')
-        Tag.objects.create(name="Ужин", slug='evening')
-        print(f"Создано тегов: {Tag.objects.count()}")
-        self.stdout.write(self.style.SUCCESS("Ингредиенты успешно загружены."))
+        Существующие строки не блокируются и не изменяются: весь ключ
+        (name, measurement_unit) совпадает, обновлять в них нечего.
+        """
+        rows = self.clean_batch(batch)
+        if not rows:
+            return
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                inserted = self.copy_rows(rows)
+            else:
+                inserted = self.insert_rows(rows)
+        self.counts['inserted'] += inserted
+        self.counts['existing'] += len(rows) - inserted
+
+    def insert_rows(self, rows):
+        names = {name for name, _ in rows}
+        existing = set(Ingredient.objects.filter(
+            name__in=names
+        ).values_list('name', 'measurement_unit'))
+        new = [row for row in rows if row not in existing]
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in new
+            ],
+            ignore_conflicts=True,
+        )
+        return len(new)
+
+    def copy_rows(self, rows):
+        """COPY во временную таблицу и INSERT ... ON CONFLICT DO NOTHING.
+
+        Временная таблица очищается при фиксации транзакции; таблица
+        ингредиентов блокируется только на вставку новых строк.
+        """
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE IF NOT EXISTS ingredient_import '
+                f'(name varchar({CHAR_MAX_LENGTH}), '
+                f'measurement_unit varchar({CHAR_MAX_LENGTH})) '
+                'ON COMMIT DELETE ROWS'
+            )
+            cursor.copy_expert(
+                'COPY ingredient_import (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT name, measurement_unit FROM ingredient_import '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+            return cursor.rowcount
@@ -0,0 +1,324 @@
+import base64
+import io
+import json
+import math
+import random
+import tracemalloc
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from core.benchmarks import add_database_arguments, benchmark_environment
+from core.models import Subscribe
+from recipe.catalog import INGREDIENTS, TAGS, bump_catalog_version
+from recipe.models import (FavoriteRecipes, Ingredient, IngredientRecipe,
+                           Recipe, ShoppingList, Tag)
+from recipe.services import rebuild_totals
+
+User = get_user_model()
+PREFIX = 'benchmark_api'
+PERCENTILES = (50, 95, 99)
+RECIPE_INGREDIENTS = 8
+RECIPE_TAGS = 2
+FAVORITES = 40
+CART = 15
+
+
+def percentile(values, percent):
+    """Процентиль по ближайшему рангу."""
+    values = sorted(values)
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+def sample(population, count):
+    """random.sample, не больше чем есть в population."""
+    return random.sample(population, min(count, len(population)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер задержки основных эндпоинтов API через тестовый клиент '
+        'на временном наборе данных: p50/p95/p99, число SQL-запросов '
+        'и пиковая память'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=50,
+            help='число замеров каждого сценария'
+        )
+        parser.add_argument(
+            '--users', type=int, default=20,
+            help='число авторов во временном наборе'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=300,
+            help='число рецептов во временном наборе'
+        )
+        parser.add_argument(
+            '--ingredients', type=int, default=500,
+            help='число ингредиентов во временном наборе'
+        )
+        parser.add_argument(
+            '--only', nargs='+', metavar='SCENARIO',
+            help='запустить только указанные сценарии'
+        )
+        parser.add_argument(
+            '--json', metavar='PATH',
+            help='сохранить результаты в json для сравнения прогонов'
+        )
+        parser.add_argument(
+            '--label', default='',
+            help='метка прогона в json, например хеш коммита'
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        add_database_arguments(parser)
+
+    def handle(self, *args, **options):
+        for name in ('iterations', 'users', 'recipes', 'ingredients'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} должно быть не меньше 1')
+        random.seed(options['seed'])
+        with benchmark_environment(options):
+            results = self.run(options)
+        report = {
+            'label': options['label'],
+            'date': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'dataset': {
+                name: options[name]
+                for name in ('users', 'recipes', 'ingredients')
+            },
+            'results': results,
+        }
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["json"]}')
+
+    def make_image(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (8, 8), 'white').save(buffer, 'PNG')
+        return (
+            'data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode()
+        )
+
+    def seed(self, options):
+        """Временный набор: авторы, рецепты, избранное и корзина."""
+        reader = User.objects.create_user(
+            username=f'{PREFIX}_reader', email=f'{PREFIX}_reader@example.com'
+        )
+        authors = User.objects.bulk_create(
+            User(username=f'{PREFIX}_{i}', email=f'{PREFIX}_{i}@example.com')
+            for i in range(options['users'])
+        )
+        authors = list(User.objects.filter(
+            username__startswith=f'{PREFIX}_'
+        ).exclude(id=reader.id))
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'{PREFIX}_{i}', slug=f'{PREFIX}-{i}') for i in range(6)
+        )
+        tags = list(Tag.objects.filter(slug__startswith=f'{PREFIX}-'))
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'{PREFIX} {i:05d}', measurement_unit='г')
+            for i in range(options['ingredients'])
+        )
+        ingredients = list(Ingredient.objects.filter(
+            name__startswith=PREFIX
+        ).values_list('id', flat=True))
+        bump_catalog_version(INGREDIENTS, TAGS)
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=random.choice(authors),
+                name=f'{PREFIX} {i}',
+                text='-',
+                image=f'recipes/{PREFIX}.png',
+                cooking_time=random.randint(1, 120),
+            )
+            for i in range(options['recipes'])
+        )
+        recipes = list(Recipe.objects.filter(
+            author__in=authors
+        ).values_list('id', flat=True))
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe_id=recipe_id, ingredient_id=ingredient_id,
+                amount=random.randint(1, 500)
+            )
+            for recipe_id in recipes
+            for ingredient_id in sample(ingredients, RECIPE_INGREDIENTS)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.id)
+            for recipe_id in recipes
+            for tag in sample(tags, RECIPE_TAGS)
+        )
+        for model, count in (
+            (FavoriteRecipes, FAVORITES), (ShoppingList, CART)
+        ):
+            model.objects.bulk_create(
+                model(user=reader, recipe_id=recipe_id)
+                for recipe_id in sample(recipes, count)
+            )
+        Subscribe.objects.bulk_create(
+            Subscribe(subscriber=reader, author=author) for author in authors
+        )
+        rebuild_totals([reader.id])
+        return reader, authors, tags, ingredients, recipes
+
+    def scenarios(self, tags, ingredients, recipes):
+        """Сценарии: имя -> (метод, адрес, тело запроса)."""
+        image = self.make_image()
+
+        def recipe_body():
+            return json.dumps({
+                'name': f'{PREFIX} new',
+                'text': '-',
+                'cooking_time': 10,
+                'image': image,
+                'tags': [tag.id for tag in sample(tags, RECIPE_TAGS)],
+                'ingredients': [
+                    {'id': ingredient_id, 'amount': random.randint(1, 500)}
+                    for ingredient_id in sample(
+                        ingredients, RECIPE_INGREDIENTS
+                    )
+                ],
+            })
+
+        detail = random.choice(recipes)
+        return {
+            'recipe_list': ('GET', '/api/recipes/', None),
+            'recipe_list_deep_page': (
+                'GET', f'/api/recipes/?page={max(len(recipes) // 6, 1)}',
+                None
+            ),
+            'recipe_detail': ('GET', f'/api/recipes/{detail}/', None),
+            'recipe_list_by_tags': (
+                'GET',
+                f'/api/recipes/?tags={tags[0].slug}&tags={tags[1].slug}',
+                None
+            ),
+            'recipe_search': (
+                'GET', f'/api/recipes/?search={PREFIX} {detail}', None
+            ),
+            'recipe_list_favorited': (
+                'GET', '/api/recipes/?is_favorited=1', None
+            ),
+            'recipe_list_in_cart': (
+                'GET', '/api/recipes/?is_in_shopping_cart=1', None
+            ),
+            'subscriptions': ('GET', '/api/users/subscriptions/', None),
+            'ingredient_search': (
+                'GET', f'/api/ingredients/?name={PREFIX} 001', None
+            ),
+            'cart_download': (
+                'GET', '/api/recipes/download_shopping_cart/', None
+            ),
+            'recipe_create': ('POST', '/api/recipes/', recipe_body),
+            'recipe_update': (
+                'PATCH', '/api/recipes/{own}/', recipe_body
+            ),
+        }
+
+    def request(self, client, method, url, body):
+        response = client.generic(
+            method, url, body() if body else '',
+            content_type='application/json'
+        )
+        if response.streaming:
+            b''.join(response.streaming_content)
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{method} {url}: {response.status_code} '
+                f'{response.content[:200]!r}'
+            )
+        return response
+
+    def measure(self, client, method, url, body, iterations):
+        self.request(client, method, url, body)
+        durations = []
+        queries = 0
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as context:
+                start = perf_counter()
+                self.request(client, method, url, body)
+                durations.append(perf_counter() - start)
+            queries = max(queries, len(context.captured_queries))
+        # память замеряется отдельным запросом: tracemalloc
+        # заметно замедляет выполнение и исказил бы задержку
+        tracemalloc.start()
+        self.request(client, method, url, body)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result = {
+            f'p{percent}_ms': round(
+                percentile(durations, percent) * 1000, 2
+            )
+            for percent in PERCENTILES
+        }
+        result['mean_ms'] = round(sum(durations) / len(durations) * 1000, 2)
+        result['queries'] = queries
+        result['peak_memory_kb'] = round(peak / 1024, 1)
+        return result
+
+    def recipe_images(self):
+        if not default_storage.exists('recipes'):
+            return set()
+        return set(default_storage.listdir('recipes')[1])
+
+    def run(self, options):
+        images = self.recipe_images()
+        reader, authors, tags, ingredients, recipes = self.seed(options)
+        try:
+            client = Client(
+                HTTP_AUTHORIZATION=(
+                    f'Token {Token.objects.create(user=reader).key}'
+                )
+            )
+            scenarios = self.scenarios(tags, ingredients, recipes)
+            unknown = set(options['only'] or ()) - set(scenarios)
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные сценарии: {", ".join(sorted(unknown))}'
+                )
+            own = self.request(
+                client, 'POST', '/api/recipes/',
+                scenarios['recipe_create'][2]
+            ).json()['id']
+            results = {}
+            self.stdout.write(
+                f'{"сценарий":<24}{"p50":>9}{"p95":>9}{"p99":>9}'
+                f'{"SQL":>6}{"память, КБ":>12}'
+            )
+            for name, (method, url, body) in scenarios.items():
+                if options['only'] and name not in options['only']:
+                    continue
+                result = self.measure(
+                    client, method, url.format(own=own), body,
+                    options['iterations']
+                )
+                results[name] = result
+                self.stdout.write(
+                    f'{name:<24}{result["p50_ms"]:>9}{result["p95_ms"]:>9}'
+                    f'{result["p99_ms"]:>9}{result["queries"]:>6}'
+                    f'{result["peak_memory_kb"]:>12}'
+                )
+            return results
+        finally:
+            # замененные при обновлении изображения не удаляются
+            # вместе с рецептом, поэтому удаляются все новые файлы
+            for name in self.recipe_images() - images:
+                default_storage.delete(f'recipes/{name}')
+            User.objects.filter(username__startswith=f'{PREFIX}_').delete()
+            Tag.objects.filter(slug__startswith=f'{PREFIX}-').delete()
+            Ingredient.objects.filter(name__startswith=PREFIX).delete()
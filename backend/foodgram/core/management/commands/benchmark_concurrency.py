@@ -0,0 +1,167 @@
+import asyncio
+import json
+import math
+from time import perf_counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+PERCENTILES = (50, 95, 99)
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?page=2',
+    '/api/ingredients/?name=со',
+)
+
+
+def percentile(values, percent):
+    """Процентиль по ближайшему рангу."""
+    values = sorted(values)
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузка на запущенный сервер множеством одновременных '
+        'медленных соединений: запросы в секунду и задержки. '
+        'Запускается поочередно против WSGI и ASGI сервера'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://127.0.0.1:8000',
+            help='адрес запущенного сервера'
+        )
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='путь запроса, можно указать несколько раз'
+        )
+        parser.add_argument(
+            '--connections', type=int, default=100,
+            help='число одновременных соединений'
+        )
+        parser.add_argument(
+            '--duration', type=float, default=20,
+            help='длительность замера, с'
+        )
+        parser.add_argument(
+            '--send-delay', type=float, default=0.0,
+            help='пауза между частями запроса (медленная отправка), с'
+        )
+        parser.add_argument(
+            '--read-chunk', type=int, default=1024,
+            help='размер порции чтения ответа, байт'
+        )
+        parser.add_argument(
+            '--read-delay', type=float, default=0.0,
+            help='пауза между порциями чтения (медленный клиент), с'
+        )
+        parser.add_argument('--token', help='токен авторизации')
+        parser.add_argument(
+            '--json', metavar='PATH',
+            help='сохранить результаты в json'
+        )
+        parser.add_argument('--label', default='')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('Поддерживается только http://хост[:порт].')
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.options = options
+        paths = options['paths'] or DEFAULT_PATHS
+        result = asyncio.run(self.run(paths))
+        self.stdout.write(
+            f'Запросов: {result["requests"]}, ошибок: {result["errors"]}, '
+            f'{result["rps"]} запр./с; задержка, мс: '
+            + ', '.join(
+                f'p{percent} {result[f"p{percent}_ms"]}'
+                for percent in PERCENTILES
+            )
+        )
+        if options['json']:
+            report = {
+                'label': options['label'],
+                'date': timezone.now().isoformat(),
+                'url': options['url'],
+                'paths': list(paths),
+                **{
+                    name: options[name]
+                    for name in (
+                        'connections', 'duration', 'send_delay',
+                        'read_chunk', 'read_delay'
+                    )
+                },
+                'result': result,
+            }
+            with open(options['json'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def request_parts(self, path):
+        """Запрос, разбитый на части для медленной отправки."""
+        headers = [
+            f'GET {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            'Accept: application/json',
+            'Connection: close',
+        ]
+        if self.options['token']:
+            headers.append(f'Authorization: Token {self.options["token"]}')
+        return [f'{header}\r\n'.encode() for header in headers] + [b'\r\n']
+
+    async def fetch(self, path):
+        """Один запрос; возвращает статус ответа."""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            for part in self.request_parts(path):
+                writer.write(part)
+                await writer.drain()
+                if self.options['send_delay']:
+                    await asyncio.sleep(self.options['send_delay'])
+            status_line = await reader.readline()
+            while await reader.read(self.options['read_chunk']):
+                if self.options['read_delay']:
+                    await asyncio.sleep(self.options['read_delay'])
+        finally:
+            writer.close()
+        return int(status_line.split()[1])
+
+    async def run(self, paths):
+        latencies = []
+        errors = 0
+        deadline = perf_counter() + self.options['duration']
+
+        async def worker(number):
+            nonlocal errors
+            request_number = number
+            while perf_counter() < deadline:
+                path = paths[request_number % len(paths)]
+                request_number += 1
+                start = perf_counter()
+                try:
+                    status = await self.fetch(path)
+                except (OSError, IndexError, ValueError):
+                    status = None
+                if status is None or status >= 500:
+                    errors += 1
+                else:
+                    latencies.append(perf_counter() - start)
+
+        start = perf_counter()
+        await asyncio.gather(*(
+            worker(number) for number in range(self.options['connections'])
+        ))
+        elapsed = perf_counter() - start
+        result = {
+            'requests': len(latencies),
+            'errors': errors,
+            'rps': round(len(latencies) / elapsed, 1),
+        }
+        for percent in PERCENTILES:
+            result[f'p{percent}_ms'] = (
+                round(percentile(latencies, percent) * 1000, 1)
+                if latencies else None
+            )
+        return result
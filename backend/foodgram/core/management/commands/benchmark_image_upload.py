@@ -0,0 +1,88 @@
+import base64
+import io
+import json
+import os
+import tracemalloc
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from core.benchmarks import add_database_arguments, benchmark_environment
+
+User = get_user_model()
+URL = '/api/users/me/avatar/'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пиковую память при загрузке аватара '
+        'в base64 (json) и файлом (multipart/form-data)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--side', type=int, default=1200,
+            help='сторона квадратного png из шума, пикс.'
+        )
+        add_database_arguments(parser)
+
+    def make_image(self, side):
+        buffer = io.BytesIO()
+        Image.frombytes(
+            'RGB', (side, side), os.urandom(side * side * 3)
+        ).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def measure(self, client, body, content_type):
+        tracemalloc.start()
+        start = perf_counter()
+        response = client.generic('PUT', URL, body, content_type)
+        elapsed = perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if response.status_code != 200:
+            raise RuntimeError(response.content)
+        return peak, elapsed
+
+    def handle(self, *args, **options):
+        with benchmark_environment(options):
+            self.run(options['side'])
+
+    def run(self, side):
+        image = self.make_image(side)
+        json_body = json.dumps({
+            'avatar': 'data:image/png;base64,'
+            + base64.b64encode(image).decode()
+        })
+        multipart_body = encode_multipart(BOUNDARY, {
+            'avatar': SimpleUploadedFile('avatar.png', image)
+        })
+        user = User.objects.create_user(
+            username='benchmark_upload', email='benchmark_upload@example.com'
+        )
+        try:
+            token = Token.objects.create(user=user)
+            client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+            self.stdout.write(
+                f'Изображение: {len(image) / 1024 / 1024:.1f} МБ, '
+                f'тело json: {len(json_body) / 1024 / 1024:.1f} МБ'
+            )
+            for title, body, content_type in (
+                ('json/base64', json_body, 'application/json'),
+                ('multipart', multipart_body, MULTIPART_CONTENT),
+            ):
+                peak, elapsed = self.measure(client, body, content_type)
+                self.stdout.write(
+                    f'{title:<12} пик памяти {peak / 1024 / 1024:7.1f} МБ, '
+                    f'время {elapsed * 1000:7.1f} мс'
+                )
+        finally:
+            user.refresh_from_db()
+            user.avatar.delete(save=False)
+            user.delete()
@@ -0,0 +1,52 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from recipe.models import Ingredient
+from recipe.search import AUTOCOMPLETE_LIMIT, ingredient_index
+
+DEFAULT_QUERIES = ('а', 'м', 'сол', 'мука', 'молоко', 'сыр', 'ой', 'перец')
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает поиск ингредиентов через icontains и через индекс'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', default=DEFAULT_QUERIES)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def measure(self, func, repeat):
+        start = perf_counter()
+        for _ in range(repeat):
+            result = func()
+        return (perf_counter() - start) / repeat * 1000, len(result)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        total = Ingredient.objects.count()
+        start = perf_counter()
+        ingredient_index.invalidate()
+        ingredient_index.get_data()
+        self.stdout.write(
+            f'Ингредиентов: {total}, построение индекса: '
+            f'{(perf_counter() - start) * 1000:.1f} мс'
+        )
+        self.stdout.write(
+            f'{"запрос":<10} {"icontains, мс":>14} {"строк":>6} '
+            f'{"индекс, мс":>11} {"строк":>6}'
+        )
+        for query in options['queries']:
+            scan_ms, scan_rows = self.measure(
+                lambda: list(Ingredient.objects.filter(
+                    name__icontains=query
+                ).values('id', 'name', 'measurement_unit')),
+                repeat
+            )
+            index_ms, index_rows = self.measure(
+                lambda: ingredient_index.search(query, AUTOCOMPLETE_LIMIT),
+                repeat
+            )
+            self.stdout.write(
+                f'{query:<10} {scan_ms:>14.3f} {scan_rows:>6} '
+                f'{index_ms:>11.3f} {index_rows:>6}'
+            )
@@ -0,0 +1,99 @@
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+
+from recipe.models import Recipe, Tag
+from recipe.search import filter_by_tags
+
+PAGE_SIZE = 6
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает фильтр рецептов по тегам через JOIN с DISTINCT '
+        'и через EXISTS на имеющихся данных: время COUNT и первой '
+        'страницы, при --explain - планы запросов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tag', action='append', dest='tags',
+            help='slug тега, можно указать несколько раз; '
+                 'по умолчанию - два первых тега'
+        )
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument(
+            '--explain', action='store_true',
+            help='вывести планы запросов'
+        )
+
+    def handle(self, *args, **options):
+        slugs = options['tags'] or list(
+            Tag.objects.order_by('id').values_list('slug', flat=True)[:2]
+        )
+        if not slugs:
+            raise CommandError('Теги отсутствуют: сгенерируйте данные.')
+        self.stdout.write(
+            f'Рецептов: {Recipe.objects.count()}, теги: {", ".join(slugs)}'
+        )
+        query = Q()
+        for slug in slugs:
+            query |= Q(tags__slug=slug)
+        recipes = Recipe.objects.order_by('-created', '-id')
+        variants = {
+            'join_distinct': recipes.filter(query).distinct(),
+            'exists_any': filter_by_tags(recipes, slugs),
+            'exists_all': filter_by_tags(recipes, slugs, match_all=True),
+        }
+        self.stdout.write(
+            f'{"вариант":<16}{"найдено":>10}{"COUNT, мс":>12}'
+            f'{"страница, мс":>15}'
+        )
+        for name, queryset in variants.items():
+            count_time = self.measure(
+                options['iterations'], queryset.count
+            )
+            page_time = self.measure(
+                options['iterations'],
+                lambda: list(queryset.values_list('id', flat=True)[
+                    :PAGE_SIZE
+                ])
+            )
+            self.stdout.write(
+                f'{name:<16}{queryset.count():>10}{count_time:>12.2f}'
+                f'{page_time:>15.2f}'
+            )
+            if options['explain']:
+                self.explain(name, queryset)
+
+    def measure(self, iterations, function):
+        """Медиана времени вызова, мс."""
+        timings = []
+        for _ in range(iterations):
+            start = perf_counter()
+            function()
+            timings.append((perf_counter() - start) * 1000)
+        return median(timings)
+
+    def explain(self, name, queryset):
+        page = queryset.values_list('id', flat=True)[:PAGE_SIZE]
+        # план того же COUNT, который выполняет пагинатор
+        with CaptureQueriesContext(connection) as queries:
+            queryset.count()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'EXPLAIN {self.explain_prefix()}{queries[-1]["sql"]}'
+            )
+            count_plan = '\n'.join(
+                ' '.join(str(column) for column in row)
+                for row in cursor.fetchall()
+            )
+        self.stdout.write(f'\n{name}: COUNT\n{count_plan}')
+        self.stdout.write(f'{name}: страница\n{page.explain()}\n')
+
+    def explain_prefix(self):
+        return 'QUERY PLAN ' if connection.vendor == 'sqlite' else ''
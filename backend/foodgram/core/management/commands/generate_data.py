@@ -0,0 +1,273 @@
+import random
+from itertools import accumulate, islice
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import Subscribe
+from recipe.catalog import INGREDIENTS, TAGS, bump_catalog_version
+from recipe.models import (FavoriteRecipes, Ingredient, IngredientRecipe,
+                           Recipe, ShoppingList, Tag)
+from recipe.services import rebuild_totals_by_range, reconcile_counters
+
+User = get_user_model()
+DEFAULT_PASSWORD = 'generated-password'
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+# сколько раз добирать недостающие уникальные значения при выборке
+PICK_ATTEMPTS = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует воспроизводимый набор данных для нагрузочных '
+        'замеров: пользователи, рецепты, ингредиенты рецептов, '
+        'подписки, избранное и списки покупок со смещенным '
+        '(Zipf) распределением популярности'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument(
+            '--recipes-per-author', type=float, default=5,
+            help='среднее число рецептов на пользователя'
+        )
+        parser.add_argument(
+            '--ingredients-per-recipe', type=float, default=8,
+            help='среднее число ингредиентов в рецепте'
+        )
+        parser.add_argument(
+            '--subscriptions', type=float, default=10,
+            help='среднее число подписок пользователя'
+        )
+        parser.add_argument(
+            '--favorites', type=float, default=20,
+            help='средний размер избранного'
+        )
+        parser.add_argument(
+            '--cart', type=float, default=5,
+            help='средний размер списка покупок'
+        )
+        parser.add_argument(
+            '--ingredients', type=int, default=0,
+            help='создать столько ингредиентов; 0 - взять из базы'
+        )
+        parser.add_argument(
+            '--tags', type=int, default=0,
+            help='создать столько тегов; 0 - взять из базы'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='показатель распределения Zipf для популярности'
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--prefix', default='gen',
+            help='префикс имен создаваемых пользователей и объектов'
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.skew = options['skew']
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix}_ уже есть, '
+                'укажите другой --prefix'
+            )
+        start = perf_counter()
+        user_ids = self.create_users(prefix, options['users'])
+        ingredient_ids = self.get_catalog(
+            Ingredient, options['ingredients'],
+            lambda i: Ingredient(
+                name=f'{prefix} ингредиент {i}',
+                measurement_unit=self.rng.choice(UNITS)
+            )
+        )
+        tag_ids = self.get_catalog(
+            Tag, options['tags'],
+            lambda i: Tag(name=f'{prefix} тег {i}', slug=f'{prefix}-tag-{i}')
+        )
+        bump_catalog_version(INGREDIENTS, TAGS)
+        recipe_ids = self.create_recipes(
+            prefix, user_ids, options['recipes_per_author']
+        )
+        self.create_recipe_links(
+            recipe_ids, ingredient_ids, tag_ids,
+            options['ingredients_per_recipe']
+        )
+        self.create_user_links(
+            user_ids, recipe_ids, options['subscriptions'],
+            options['favorites'], options['cart']
+        )
+        if user_ids:
+            start_totals = perf_counter()
+            self.report('Суммы списков покупок', rebuild_totals_by_range(
+                user_ids[0], user_ids[-1], self.batch_size
+            ), start_totals)
+        # вставка пачками идет в обход сигналов и счетчиков
+        start_counters = perf_counter()
+        self.report(
+            'Счетчики', sum(reconcile_counters().values()), start_counters
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {perf_counter() - start:.1f} с'
+        ))
+
+    def report(self, title, count, start):
+        self.stdout.write(
+            f'{title}: {count} ({perf_counter() - start:.1f} с)'
+        )
+
+    def bulk_insert(self, model, objects):
+        """Вставка пачками по batch_size в одной транзакции."""
+        objects = iter(objects)
+        count = 0
+        with transaction.atomic():
+            while True:
+                batch = list(islice(objects, self.batch_size))
+                if not batch:
+                    return count
+                model.objects.bulk_create(batch)
+                count += len(batch)
+
+    def amount(self, mean, limit):
+        """Смещенное количество: большинство мало, единицы - много."""
+        if mean <= 0:
+            return 0
+        return min(int(self.rng.expovariate(1 / mean)), limit)
+
+    def popularity(self, ids):
+        """Ids в случайном порядке и накопленные веса Zipf для них."""
+        ids = list(ids)
+        self.rng.shuffle(ids)
+        weights = accumulate(
+            1 / (rank + 1) ** self.skew for rank in range(len(ids))
+        )
+        return ids, list(weights)
+
+    def pick(self, population, amount, exclude=None):
+        """До amount разных значений с учетом популярности."""
+        ids, weights = population
+        amount = min(amount, len(ids))
+        chosen = set()
+        for _ in range(PICK_ATTEMPTS):
+            if len(chosen) >= amount:
+                break
+            chosen.update(self.rng.choices(
+                ids, cum_weights=weights, k=amount - len(chosen)
+            ))
+            chosen.discard(exclude)
+        return chosen
+
+    def create_users(self, prefix, count):
+        start = perf_counter()
+        password = make_password(DEFAULT_PASSWORD)
+        created = self.bulk_insert(User, (
+            User(
+                username=f'{prefix}_{i}',
+                email=f'{prefix}_{i}@example.com',
+                first_name=f'Имя {i}',
+                last_name=f'Фамилия {i}',
+                password=password,
+            )
+            for i in range(count)
+        ))
+        self.report('Пользователи', created, start)
+        return list(User.objects.filter(
+            username__startswith=f'{prefix}_'
+        ).order_by('id').values_list('id', flat=True))
+
+    def get_catalog(self, model, count, factory):
+        start = perf_counter()
+        if count:
+            created = self.bulk_insert(model, map(factory, range(count)))
+            self.report(model._meta.verbose_name_plural, created, start)
+        ids = list(model.objects.order_by('id').values_list('id', flat=True))
+        if not ids:
+            raise CommandError(
+                f'{model._meta.verbose_name_plural} отсутствуют: загрузите '
+                'справочник или задайте их количество'
+            )
+        return ids
+
+    def create_recipes(self, prefix, user_ids, per_author):
+        start = perf_counter()
+        created = self.bulk_insert(Recipe, (
+            Recipe(
+                author_id=author_id,
+                name=f'{prefix} рецепт {author_id}-{number}',
+                text='Сгенерированный рецепт.',
+                image=f'recipes/{prefix}.png',
+                cooking_time=self.rng.randint(1, 180),
+            )
+            for author_id in user_ids
+            for number in range(self.amount(per_author, 1000))
+        ))
+        self.report('Рецепты', created, start)
+        return list(Recipe.objects.filter(
+            author__username__startswith=f'{prefix}_'
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_recipe_links(self, recipe_ids, ingredient_ids, tag_ids,
+                            per_recipe):
+        start = perf_counter()
+        ingredients = self.popularity(ingredient_ids)
+        created = self.bulk_insert(IngredientRecipe, (
+            IngredientRecipe(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=self.rng.randint(1, 1000),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in self.pick(
+                ingredients, max(self.amount(per_recipe, 50), 1)
+            )
+        ))
+        self.report('Ингредиенты рецептов', created, start)
+        start = perf_counter()
+        through = Recipe.tags.through
+        created = self.bulk_insert(through, (
+            through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in self.rng.sample(
+                tag_ids, min(self.rng.randint(1, 3), len(tag_ids))
+            )
+        ))
+        self.report('Теги рецептов', created, start)
+
+    def create_user_links(self, user_ids, recipe_ids, subscriptions,
+                          favorites, cart):
+        authors = self.popularity(user_ids)
+        recipes = self.popularity(recipe_ids)
+        for title, model, population, mean, factory in (
+            ('Подписки', Subscribe, authors, subscriptions,
+             lambda user_id, author_id: Subscribe(
+                 subscriber_id=user_id, author_id=author_id
+             )),
+            ('Избранное', FavoriteRecipes, recipes, favorites,
+             lambda user_id, recipe_id: FavoriteRecipes(
+                 user_id=user_id, recipe_id=recipe_id
+             )),
+            ('Списки покупок', ShoppingList, recipes, cart,
+             lambda user_id, recipe_id: ShoppingList(
+                 user_id=user_id, recipe_id=recipe_id
+             )),
+        ):
+            if not population[0]:
+                continue
+            start = perf_counter()
+            created = self.bulk_insert(model, (
+                factory(user_id, target_id)
+                for user_id in user_ids
+                for target_id in self.pick(
+                    population, self.amount(mean, 1000),
+                    # себя в подписках не бывает
+                    exclude=user_id if model is Subscribe else None
+                )
+            ))
+            self.report(title, created, start)
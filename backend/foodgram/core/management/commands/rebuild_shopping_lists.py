@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipe.services import rebuild_totals
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает суммы ингредиентов в списках покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            nargs='+',
+            dest='user_ids',
+            help='id пользователей; по умолчанию пересчитываются все',
+        )
+
+    def handle(self, *args, **options):
+        created = rebuild_totals(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересчитаны, строк: {created}.'
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipe.services import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет счетчики избранного, списков покупок, подписчиков '
+        'и рецептов с данными и исправляет разошедшиеся'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='размер диапазона id в одном проходе'
+        )
+
+    def handle(self, *args, **options):
+        fixed = reconcile_counters(options['batch_size'])
+        for counter, count in fixed.items():
+            self.stdout.write(f'{counter}: исправлено {count}')
+        self.stdout.write(self.style.SUCCESS('Счетчики сверены.'))
@@ -11,6 +11,18 @@ class User(AbstractUser):
         upload_to='users/',
         null=True,
     )
+    # счетчики обновляются вместе с подписками и рецептами,
+    # сверяются командой reconcile_counters
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False,
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -0,0 +1,97 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+_read_alias = ContextVar('read_alias', default=None)
+
+STICKY_COOKIE = 'read_primary'
+STICKY_SALT = 'core.replicas.primary'
+
+
+def _sticky_key(user_id):
+    return f'replicas:primary:{user_id}'
+
+
+def stick_to_primary(response, user_id):
+    """Чтения пользователя после записи идут в основную базу.
+
+    Реплика может отставать, поэтому REPLICA_STICKY_SECONDS после
+    записи пользователь видит свои изменения из основной базы.
+    Отметка ставится в подписанную куку ответа: ее получит любой
+    воркер, даже без общего кеша. Флаг в кеше дополнительно
+    покрывает другие клиенты того же пользователя.
+    """
+    if settings.DATABASE_REPLICAS:
+        cache.set(_sticky_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+        response.set_signed_cookie(
+            STICKY_COOKIE, user_id, salt=STICKY_SALT,
+            max_age=settings.REPLICA_STICKY_SECONDS,
+            httponly=True, samesite='Lax'
+        )
+
+
+def is_sticky(request, user_id):
+    """Пользователь недавно изменял данные."""
+    cookie = request.get_signed_cookie(
+        STICKY_COOKIE, default=None, salt=STICKY_SALT,
+        max_age=settings.REPLICA_STICKY_SECONDS
+    )
+    return cookie == str(user_id) or bool(cache.get(_sticky_key(user_id)))
+
+
+def choose_replica(request):
+    """Реплика для чтения или None, если читать из основной базы."""
+    if not settings.DATABASE_REPLICAS:
+        return None
+    user = request.user
+    if user.is_authenticated and is_sticky(request, user.id):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def use_read_alias(alias):
+    """Чтения до конца текущего контекста идут в alias."""
+    _read_alias.set(alias)
+
+
+@contextmanager
+def read_from(alias):
+    """Чтения внутри блока идут в alias; None - основная база."""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def primary():
+    """Чтения из основной базы.
+
+    Так строятся данные, которые кешируются под версией: прочитанные
+    из отстающей реплики, они остались бы в кеше до следующей смены
+    версии.
+    """
+    return read_from(None)
+
+
+class ReplicaRouter:
+    """Чтения - в реплику, выбранную для текущего запроса.
+
+    Контекстная переменная задается только для безопасных запросов
+    к вьюсетам с ReplicaReadMixin, поэтому остальной код, команды
+    и миграции работают с основной базой. Запись всегда идет
+    в основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
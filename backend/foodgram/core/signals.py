@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_tokens, token_cache
+from .models import Subscribe
+from recipe.services import change_counter
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Выход пользователя: djoser удаляет его токен."""
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=Subscribe)
+def subscriber_added(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'subscribers_count', 1)
+
+
+@receiver(post_delete, sender=Subscribe)
+def subscriber_removed(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'subscribers_count', -1)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    """Смена пароля, деактивация и правка профиля.
+
+    В кеше токенов хранится объект пользователя, поэтому он
+    сбрасывается при любом сохранении, кроме отметки о входе.
+    """
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidate_tokens({
+        *token_cache.user_keys(instance.pk),
+        *Token.objects.filter(user=instance).values_list('key', flat=True),
+    })
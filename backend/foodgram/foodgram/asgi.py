@@ -1,7 +1,17 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+# обработчик с потоковой отдачей из пула ORM, см. api.async_views
+from api.async_views import StreamingASGIHandler  # noqa: E402
+
+# карта коротких ссылок загружается при старте воркера
+from recipe.shortlinks import short_links  # noqa: E402
+
+application = StreamingASGIHandler()
+
+short_links.warm()
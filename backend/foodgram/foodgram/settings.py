@@ -34,11 +34,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.StickyPrimaryMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -78,9 +80,71 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # тестовая база в файле: в памяти SQLite не дает
+            # параллельным соединениям ждать блокировку
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
         }
     }
 
+# Реплики только для чтения: DB_REPLICA_HOSTS=хост[:порт],... для
+# Postgres или SQLITE_REPLICA=путь к второй базе в dev-режиме.
+DATABASE_REPLICAS = []
+if not DEBUG:
+    for number, replica in enumerate(
+        filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1
+    ):
+        host, _, port = replica.strip().partition(':')
+        DATABASES[f'replica_{number}'] = {
+            **DATABASES['default'],
+            'HOST': host,
+            'PORT': port or DATABASES['default']['PORT'],
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_REPLICAS.append(f'replica_{number}')
+elif os.getenv('SQLITE_REPLICA'):
+    DATABASES['replica_1'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('SQLITE_REPLICA'),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append('replica_1')
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# сколько секунд после записи пользователь читает из основной базы
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+
+# Версии справочников и другие кеши. Чтобы сброс был виден всем
+# воркерам и командам manage.py, нужен общий кеш, например
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# и CACHE_LOCATION=/tmp/foodgram_cache.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+# В одном кеше лежат представления рецептов, версии, наборы избранного
+# и поколения токенов. При 300 записях по умолчанию кеш в памяти
+# и файловый кеш постоянно вытесняли бы версии, а новая версия - это
+# промах по всем зависящим от нее записям. Memcached и Redis
+# ограничиваются памятью и этот параметр не принимают.
+if CACHES['default']['BACKEND'] in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 50000)),
+    }
+# срок жизни версий в кеше процесса: столько секунд другие процессы
+# могут отдавать устаревшие справочники (см. core.caches)
+LOCAL_CACHE_VERSION_TIMEOUT = int(
+    os.getenv('LOCAL_CACHE_VERSION_TIMEOUT', 30)
+)
+# число воркеров gunicorn (gunicorn читает ту же переменную); больше
+# одного - только с общим кешем, иначе проверка core.E001 не пройдет
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -111,7 +175,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'core.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -121,6 +185,14 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 6
 }
 
+# Кеш токенов авторизации: в памяти процесса (размер и срок жизни, с)
+# и, при AUTH_TOKEN_SHARED_CACHE=True, в общем кеше Django
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 30))
+AUTH_TOKEN_SHARED_CACHE = os.getenv(
+    'AUTH_TOKEN_SHARED_CACHE', 'False'
+).lower() in ('true', '1')
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'LOGOUT_ON_PASSWORD_CHANGE': True,
@@ -144,8 +216,20 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = 'media'
 
+# файлы из multipart/form-data сразу пишутся во временный файл
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
 CSV_FILES_DIR = os.path.join(BASE_DIR, 'data')
 
+# Асинхронные вью для частых запросов чтения при запуске через ASGI
+# (foodgram.asgi:application). Работа с базой идет в пуле потоков
+# ограниченного размера: не больше ASYNC_ORM_THREADS соединений
+# с базой на процесс.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False').lower() in ('true', '1')
+ASYNC_ORM_THREADS = int(os.getenv('ASYNC_ORM_THREADS', 8))
+
 CSRF_TRUSTED_ORIGINS = [
     "https://foodgramyandex.ddns.net"
 ]
@@ -5,3 +5,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
 application = get_wsgi_application()
+
+# карта коротких ссылок загружается при старте воркера
+from recipe.shortlinks import short_links  # noqa: E402
+
+short_links.warm()
@@ -0,0 +1,69 @@
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+from core.caches import version_timeout
+
+INGREDIENTS = 'ingredients'
+TAGS = 'tags'
+RESPONSES_MAX_SIZE = 256
+
+
+def _version_key(catalog):
+    return f'catalog:{catalog}:version'
+
+
+def get_catalog_version(catalog):
+    """Версия справочника для сброса данных в памяти процесса.
+
+    Версия хранится в кеше Django, поэтому при общем кеше сбрасывается
+    сразу во всех процессах, включая команды manage.py. В кеше процесса
+    версия истекает через LOCAL_CACHE_VERSION_TIMEOUT: ответы и индексы
+    других процессов устаревают не дольше этого срока. Версия - только
+    ключ сброса: ETag ответа считается по его содержимому.
+    """
+    version = cache.get(_version_key(catalog))
+    if version is None:
+        cache.add(_version_key(catalog), uuid.uuid4().hex, version_timeout())
+        version = cache.get(_version_key(catalog))
+    return version
+
+
+def bump_catalog_version(*catalogs):
+    """Смена версии справочников после изменения данных."""
+    cache.set_many(
+        {_version_key(catalog): uuid.uuid4().hex for catalog in catalogs},
+        version_timeout()
+    )
+
+
+class CatalogResponses:
+    """Ограниченный LRU-кеш готовых ответов справочников в процессе.
+
+    Ключ включает версию справочника, поэтому устаревшие записи
+    не читаются и вытесняются новыми. Значение - данные ответа и ETag.
+    """
+
+    def __init__(self, max_size=RESPONSES_MAX_SIZE):
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self.max_size = max_size
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+catalog_responses = CatalogResponses()
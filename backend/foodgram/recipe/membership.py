@@ -0,0 +1,77 @@
+import uuid
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import FavoriteRecipes, ShoppingList
+from core.caches import version_timeout
+from core.replicas import primary
+
+MEMBERSHIP_TIMEOUT = 60 * 60
+
+Membership = namedtuple('Membership', ('favorites', 'shopping_cart'))
+EMPTY_MEMBERSHIP = Membership(frozenset(), frozenset())
+
+
+def _version_key(user_id):
+    return f'membership:{user_id}:version'
+
+
+def _load(user_id):
+    def recipe_ids(model):
+        return frozenset(
+            model.objects.filter(
+                user_id=user_id
+            ).values_list('recipe_id', flat=True)
+        )
+    # наборы кешируются под версией, читаются из основной базы
+    with primary():
+        return Membership(
+            recipe_ids(FavoriteRecipes), recipe_ids(ShoppingList)
+        )
+
+
+def get_membership(user_id):
+    """Id рецептов в избранном и в списке покупок пользователя.
+
+    Наборы хранятся в кеше под версией пользователя; после изменения
+    избранного или корзины версия меняется и наборы читаются заново.
+    С кешем процесса версия истекает (core.caches.version_timeout),
+    поэтому изменения из других процессов видны через короткий срок.
+    """
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(_version_key(user_id), version, version_timeout())
+    key = f'membership:{user_id}:{version}'
+    membership = cache.get(key)
+    if membership is None:
+        membership = _load(user_id)
+        cache.set(key, membership, MEMBERSHIP_TIMEOUT)
+    return membership
+
+
+def get_request_membership(request):
+    """Наборы текущего пользователя, загружаются один раз за запрос."""
+    if not request.user.is_authenticated:
+        return EMPTY_MEMBERSHIP
+    membership = getattr(request, 'recipe_membership', None)
+    if membership is None:
+        membership = get_membership(request.user.id)
+        request.recipe_membership = membership
+    return membership
+
+
+def bump_membership_version(*user_ids):
+    """Смена версии после фиксации транзакции.
+
+    Если сменить версию до фиксации, параллельный запрос успеет
+    закешировать под новой версией еще старые данные.
+    """
+    def bump():
+        cache.set_many(
+            {_version_key(user_id): uuid.uuid4().hex for user_id in user_ids},
+            version_timeout()
+        )
+    transaction.on_commit(bump)
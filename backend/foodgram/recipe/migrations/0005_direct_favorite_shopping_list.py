@@ -0,0 +1,95 @@
+# Generated by Django 3.2.16 on 2026-10-18 21:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+BATCH_SIZE = 1000
+
+
+def copy_links(apps, schema_editor):
+    """Перенос связей m2m в таблицы (пользователь, рецепт)."""
+    for old_name, new_name in (
+        ('FavoriteRecipes', 'NewFavoriteRecipes'),
+        ('ShoppingList', 'NewShoppingList'),
+    ):
+        OldModel = apps.get_model('recipe', old_name)
+        NewModel = apps.get_model('recipe', new_name)
+        Through = OldModel._meta.get_field('recipes').remote_field.through
+        owner = OldModel._meta.model_name
+        links = Through.objects.values_list(
+            f'{owner}__user_id', 'recipe_id'
+        ).order_by()
+        now = django.utils.timezone.now()
+        batch = []
+        for user_id, recipe_id in links.iterator():
+            batch.append(
+                NewModel(user_id=user_id, recipe_id=recipe_id, created=now)
+            )
+            if len(batch) >= BATCH_SIZE:
+                NewModel.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        NewModel.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def copy_links_back(apps, schema_editor):
+    for old_name, new_name in (
+        ('FavoriteRecipes', 'NewFavoriteRecipes'),
+        ('ShoppingList', 'NewShoppingList'),
+    ):
+        OldModel = apps.get_model('recipe', old_name)
+        NewModel = apps.get_model('recipe', new_name)
+        Through = OldModel._meta.get_field('recipes').remote_field.through
+        owner = OldModel._meta.model_name
+        containers = {}
+        links = []
+        for user_id, recipe_id in NewModel.objects.values_list(
+            'user_id', 'recipe_id'
+        ).iterator():
+            if user_id not in containers:
+                containers[user_id] = OldModel.objects.create(
+                    user_id=user_id
+                ).id
+            links.append(Through(
+                **{f'{owner}_id': containers[user_id], 'recipe_id': recipe_id}
+            ))
+        Through.objects.bulk_create(links, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipe', '0004_recipe_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewFavoriteRecipes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipe.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NewShoppingList',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipe.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='newfavoriterecipes',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_favorite_recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='newshoppinglist',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shopping_list_recipe'),
+        ),
+        migrations.RunPython(copy_links, copy_links_back),
+    ]
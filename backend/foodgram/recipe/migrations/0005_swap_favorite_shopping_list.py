@@ -0,0 +1,61 @@
+# Generated by Django 3.2.16 on 2026-10-18 21:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # замена старых таблиц отдельной миграцией: в PostgreSQL ALTER TABLE
+    # в одной транзакции с переносом строк в 0005 завершится ошибкой
+    # pending trigger events
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipe', '0005_direct_favorite_shopping_list'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='FavoriteRecipes',
+        ),
+        migrations.DeleteModel(
+            name='ShoppingList',
+        ),
+        migrations.RenameModel(
+            old_name='NewFavoriteRecipes',
+            new_name='FavoriteRecipes',
+        ),
+        migrations.RenameModel(
+            old_name='NewShoppingList',
+            new_name='ShoppingList',
+        ),
+        migrations.AlterModelOptions(
+            name='favoriterecipes',
+            options={'verbose_name': 'Избранное', 'verbose_name_plural': 'Избранное'},
+        ),
+        migrations.AlterModelOptions(
+            name='shoppinglist',
+            options={'verbose_name': 'Список покупок', 'verbose_name_plural': 'Список покупок'},
+        ),
+        migrations.AlterField(
+            model_name='favoriterecipes',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favorited', to='recipe.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='favoriterecipes',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favorite_recipes', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='shoppinglist',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to='recipe.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='shoppinglist',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.16 on 2026-10-18 20:29
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """Слияние одинаковых (name, measurement_unit) перед ограничением.
+
+    Ссылки рецептов и сумм списков покупок переносятся на ингредиент
+    с наименьшим id, суммы одного пользователя складываются.
+    """
+    Ingredient = apps.get_model('recipe', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipe', 'IngredientRecipe')
+    ShoppingListIngredient = apps.get_model('recipe', 'ShoppingListIngredient')
+    groups = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep=Min('id'), total=Count('id')).filter(total__gt=1)
+    for group in groups.iterator():
+        duplicates = list(Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(id=group['keep']).values_list('id', flat=True))
+        IngredientRecipe.objects.filter(
+            ingredient_id__in=duplicates
+        ).update(ingredient_id=group['keep'])
+        for total in ShoppingListIngredient.objects.filter(
+            ingredient_id__in=duplicates
+        ):
+            kept, created = ShoppingListIngredient.objects.get_or_create(
+                user_id=total.user_id, ingredient_id=group['keep'],
+                defaults={'amount': 0}
+            )
+            kept.amount += total.amount
+            kept.save(update_fields=('amount',))
+            total.delete()
+        Ingredient.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0005_swap_favorite_shopping_list'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.16 on 2026-10-18 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # ограничение добавляется отдельной миграцией: в PostgreSQL
+    # ALTER TABLE в одной транзакции с удалением строк, на которые
+    # ссылаются отложенные внешние ключи, завершится ошибкой
+
+    dependencies = [
+        ('recipe', '0006_merge_duplicate_ingredients'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 3.2.16 on 2026-10-18 21:40
+
+from django.db import migrations
+
+# SQL записан здесь, а не берется из recipe.search: изменения модуля
+# не должны менять уже примененную миграцию.
+
+# Postgres: столбец tsvector вычисляется самой базой при вставке
+# и изменении рецепта, поиск идет по GIN-индексу.
+POSTGRES_CREATE = [
+    'ALTER TABLE recipe_recipe ADD COLUMN search_vector tsvector '
+    'GENERATED ALWAYS AS ('
+    "setweight(to_tsvector('russian'::regconfig, coalesce(name, '')), 'A')"
+    " || setweight(to_tsvector('russian'::regconfig, coalesce(text, '')), "
+    "'B')) STORED",
+    'CREATE INDEX recipe_search_vector_idx ON recipe_recipe '
+    'USING gin (search_vector)',
+]
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS recipe_search_vector_idx',
+    'ALTER TABLE recipe_recipe DROP COLUMN IF EXISTS search_vector',
+]
+
+# SQLite (dev): внешняя таблица FTS5 поверх рецептов, которую
+# поддерживают триггеры.
+SQLITE_CREATE = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS recipe_search USING fts5('
+    "name, text, content='recipe_recipe', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    'CREATE TRIGGER IF NOT EXISTS recipe_search_insert '
+    'AFTER INSERT ON recipe_recipe BEGIN '
+    'INSERT INTO recipe_search (rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    'CREATE TRIGGER IF NOT EXISTS recipe_search_update '
+    'AFTER UPDATE OF name, text ON recipe_recipe BEGIN '
+    'INSERT INTO recipe_search (recipe_search, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); "
+    'INSERT INTO recipe_search (rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    'CREATE TRIGGER IF NOT EXISTS recipe_search_delete '
+    'AFTER DELETE ON recipe_recipe BEGIN '
+    'INSERT INTO recipe_search (recipe_search, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); END",
+    "INSERT INTO recipe_search (recipe_search) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS recipe_search_insert',
+    'DROP TRIGGER IF EXISTS recipe_search_update',
+    'DROP TRIGGER IF EXISTS recipe_search_delete',
+    'DROP TABLE IF EXISTS recipe_search',
+]
+
+
+class VendorRunSQL(migrations.RunSQL):
+    """RunSQL только для базы указанной СУБД."""
+
+    def __init__(self, vendor, *args, **kwargs):
+        self.vendor = vendor
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, args, kwargs = super().deconstruct()
+        return name, (self.vendor, *args), kwargs
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0007_ingredient_unique'),
+    ]
+
+    operations = [
+        VendorRunSQL('postgresql', POSTGRES_CREATE, POSTGRES_DROP),
+        VendorRunSQL('sqlite', SQLITE_CREATE, SQLITE_DROP),
+    ]
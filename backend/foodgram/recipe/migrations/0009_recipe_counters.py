@@ -0,0 +1,56 @@
+# Generated by Django 3.2.16 on 2026-10-18 22:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def row_count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    """Начальные значения счетчиков по существующим строкам."""
+    Recipe = apps.get_model('recipe', 'Recipe')
+    FavoriteRecipes = apps.get_model('recipe', 'FavoriteRecipes')
+    ShoppingList = apps.get_model('recipe', 'ShoppingList')
+    User = apps.get_model('core', 'User')
+    Subscribe = apps.get_model('core', 'Subscribe')
+    Recipe.objects.update(
+        favorites_count=row_count(FavoriteRecipes, 'recipe'),
+        shopping_cart_count=row_count(ShoppingList, 'recipe'),
+    )
+    User.objects.update(
+        subscribers_count=row_count(Subscribe, 'author'),
+        recipes_count=row_count(Recipe, 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_user_counters'),
+        ('recipe', '0008_recipe_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_id_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
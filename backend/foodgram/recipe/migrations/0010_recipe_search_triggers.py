@@ -0,0 +1,65 @@
+# Generated by Django 3.2.16 on 2026-10-18 22:10
+
+from django.db import migrations
+
+# SQLite выполняет AddField 0009 пересозданием таблицы recipe_recipe,
+# и триггеры индекса FTS5 из 0008 удаляются вместе со старой таблицей.
+# Каждая миграция, пересоздающая recipe_recipe, должна заканчиваться
+# такой же операцией; tests/test_search.py проверяет триггеры.
+SQLITE_TRIGGERS = [
+    'CREATE TRIGGER IF NOT EXISTS recipe_search_insert '
+    'AFTER INSERT ON recipe_recipe BEGIN '
+    'INSERT INTO recipe_search (rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    'CREATE TRIGGER IF NOT EXISTS recipe_search_update '
+    'AFTER UPDATE OF name, text ON recipe_recipe BEGIN '
+    'INSERT INTO recipe_search (recipe_search, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); "
+    'INSERT INTO recipe_search (rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    'CREATE TRIGGER IF NOT EXISTS recipe_search_delete '
+    'AFTER DELETE ON recipe_recipe BEGIN '
+    'INSERT INTO recipe_search (recipe_search, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); END",
+    # изменения рецептов без триггеров в индекс не попали
+    "INSERT INTO recipe_search (recipe_search) VALUES ('rebuild')",
+]
+
+
+class VendorRunSQL(migrations.RunSQL):
+    """RunSQL только для базы указанной СУБД."""
+
+    def __init__(self, vendor, *args, **kwargs):
+        self.vendor = vendor
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, args, kwargs = super().deconstruct()
+        return name, (self.vendor, *args), kwargs
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0009_recipe_counters'),
+    ]
+
+    operations = [
+        # откат 0009 снова пересоздает таблицу, а откат 0008 удаляет
+        # триггеры, если они есть
+        VendorRunSQL('sqlite', SQLITE_TRIGGERS, migrations.RunSQL.noop),
+    ]
@@ -50,6 +50,12 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient'
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -105,11 +111,32 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата создания'
     )
+    # счетчики обновляются вместе с избранным и списками покупок,
+    # сверяются командой reconcile_counters
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=('-created', '-id'), name='recipe_created_id_idx'
+            ),
+            models.Index(
+                fields=('-favorites_count', '-id'),
+                name='recipe_favorites_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -175,7 +202,7 @@ class TagInRecipe(models.Model):
 
 
 class ShoppingList(models.Model):
-    """Список покупок пользователя."""
+    """Рецепт в списке покупок пользователя."""
 
     user = models.ForeignKey(
         User,
@@ -183,23 +210,33 @@ class ShoppingList(models.Model):
         related_name='shopping_list',
         verbose_name='Пользователь',
     )
-    recipes = models.ManyToManyField(
+    recipe = models.ForeignKey(
         Recipe,
+        on_delete=models.CASCADE,
         related_name='shopping_list',
-        verbose_name='Рецепты',
+        verbose_name='Рецепт',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата добавления'
     )
 
     class Meta:
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Список покупок'
-        unique_together = ('user',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_shopping_list_recipe'
+            )
+        ]
 
     def __str__(self):
-        return f"Список покупок {self.user.username}"
+        return f'{self.recipe} в списке покупок {self.user}'
 
 
 class FavoriteRecipes(models.Model):
-    """Модель избранных рецептов."""
+    """Рецепт в избранном пользователя."""
 
     user = models.ForeignKey(
         User,
@@ -207,16 +244,60 @@ class FavoriteRecipes(models.Model):
         related_name='favorite_recipes',
         verbose_name='Пользователь',
     )
-    recipes = models.ManyToManyField(
+    recipe = models.ForeignKey(
         Recipe,
+        on_delete=models.CASCADE,
         related_name='favorited',
-        verbose_name='Рецепты',
+        verbose_name='Рецепт',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата добавления'
     )
 
     class Meta:
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
-        unique_together = ('user',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_favorite_recipe'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в избранном {self.user}'
+
+
+class ShoppingListIngredient(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_ingredients',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_totals',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_ingredient'
+            )
+        ]
 
     def __str__(self):
-        return f"Избранные рецепты {self.user.username}"
+        return f'{self.ingredient} {self.amount} ({self.user})'
@@ -0,0 +1,185 @@
+import re
+import threading
+from bisect import bisect_left
+
+from django.db.models import BooleanField, Exists, FloatField, OuterRef, Q
+from django.db.models.expressions import RawSQL
+
+from .catalog import INGREDIENTS, TAGS, get_catalog_version
+from .models import Ingredient, Recipe, Tag
+from core.replicas import primary
+
+AUTOCOMPLETE_LIMIT = 50
+SEARCH_CONFIG = 'russian'
+# SQLite (dev): внешняя таблица FTS5 поверх рецептов и поддерживающие
+# ее триггеры (миграции 0008 и 0010). SQLite изменяет таблицу через
+# ее пересоздание, а триггеры удаляются вместе со старой таблицей:
+# после каждой такой миграции recipe_recipe их нужно создать заново.
+SEARCH_TABLE = 'recipe_search'
+SEARCH_TRIGGERS = (
+    'recipe_search_insert', 'recipe_search_update', 'recipe_search_delete'
+)
+SEARCH_WORD = re.compile(r'\w+')
+RECIPE_TABLE = Recipe._meta.db_table
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Названия хранятся отсортированными в нижнем регистре: совпадения
+    по началу строки находятся бинарным поиском, совпадения внутри
+    строки добираются проходом по списку до заполнения лимита.
+    Индекс перестраивается при смене версии справочника ингредиентов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+
+    def _build(self):
+        rows = sorted(
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit'),
+            key=lambda row: (row[1].lower(), row[0])
+        )
+        keys = [name.lower() for _, name, _ in rows]
+        items = [
+            {'id': id, 'name': name, 'measurement_unit': measurement_unit}
+            for id, name, measurement_unit in rows
+        ]
+        return keys, items
+
+    def get_data(self):
+        """Индекс строится при первом обращении после смены версии."""
+        version = get_catalog_version(INGREDIENTS)
+        data = self._data
+        if data is None or data[0] != version:
+            with self._lock:
+                data = self._data
+                if data is None or data[0] != version:
+                    with primary():
+                        data = self._data = (version, *self._build())
+        return data[1:]
+
+    def invalidate(self):
+        self._data = None
+
+    def search(self, query, limit=AUTOCOMPLETE_LIMIT):
+        """Сначала совпадения по началу названия, затем внутри него."""
+        keys, items = self.get_data()
+        query = query.strip().lower()
+        results = []
+        position = bisect_left(keys, query)
+        while (
+            position < len(keys)
+            and len(results) < limit
+            and keys[position].startswith(query)
+        ):
+            results.append(items[position])
+            position += 1
+        if len(results) < limit:
+            for key, item in zip(keys, items):
+                if query in key and not key.startswith(query):
+                    results.append(item)
+                    if len(results) >= limit:
+                        break
+        return results
+
+
+ingredient_index = IngredientIndex()
+
+
+class TagIndex:
+    """Соответствие slug -> id тегов в памяти процесса.
+
+    Перестраивается при смене версии справочника тегов, поэтому
+    фильтр по тегам не обращается к таблице тегов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+
+    def get_data(self):
+        version = get_catalog_version(TAGS)
+        data = self._data
+        if data is None or data[0] != version:
+            with self._lock:
+                data = self._data
+                if data is None or data[0] != version:
+                    with primary():
+                        data = self._data = (
+                            version,
+                            dict(Tag.objects.values_list('slug', 'id'))
+                        )
+        return data[1]
+
+    def ids(self, slugs):
+        """Id известных тегов; неизвестные slug пропускаются."""
+        slug_ids = self.get_data()
+        return {slug_ids[slug] for slug in slugs if slug in slug_ids}
+
+
+tag_index = TagIndex()
+
+
+def filter_by_tags(queryset, slugs, match_all=False):
+    """Рецепты с любым (или, при match_all, с каждым) из тегов.
+
+    Условие - подзапрос EXISTS по уникальному индексу (recipe, tag)
+    связующей таблицы вместо JOIN, поэтому строки рецептов
+    не размножаются и DISTINCT не нужен.
+    """
+    slugs = set(slugs)
+    tag_ids = tag_index.ids(slugs)
+    if not tag_ids or (match_all and len(tag_ids) < len(slugs)):
+        return queryset.none()
+    links = Recipe.tags.through.objects.filter(recipe_id=OuterRef('pk'))
+    if not match_all:
+        return queryset.filter(Exists(links.filter(tag_id__in=tag_ids)))
+    for tag_id in tag_ids:
+        queryset = queryset.filter(Exists(links.filter(tag_id=tag_id)))
+    return queryset
+
+
+def _execute(connection, statements):
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def search_recipes(queryset, query, connection):
+    """Рецепты, подходящие под запрос, по убыванию релевантности.
+
+    Postgres ищет по словоформам (русский стеммер) с весом названия
+    выше описания, SQLite - по началам слов через FTS5. Остальные
+    фильтры queryset сохраняются.
+    """
+    if connection.vendor == 'postgresql':
+        # столбца search_vector нет в модели: он генерируется базой
+        tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        queryset = queryset.filter(RawSQL(
+            f'{RECIPE_TABLE}.search_vector @@ {tsquery}', (query,),
+            output_field=BooleanField()
+        )).annotate(search_rank=RawSQL(
+            f'ts_rank({RECIPE_TABLE}.search_vector, {tsquery})', (query,),
+            output_field=FloatField()
+        ))
+    elif connection.vendor == 'sqlite':
+        words = SEARCH_WORD.findall(query)
+        if not words:
+            return queryset.none()
+        # каждое слово в кавычках: спецсимволы FTS5 не влияют на разбор
+        match = ' '.join(f'"{word}"*' for word in words)
+        queryset = queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+            (match,)
+        )).annotate(search_rank=RawSQL(
+            f'SELECT -rank FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+            f'AND rowid = {RECIPE_TABLE}.id',
+            (match,), output_field=FloatField()
+        ))
+    else:
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        )
+    return queryset.order_by('-search_rank', '-created', '-id')
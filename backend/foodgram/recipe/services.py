@@ -0,0 +1,294 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .membership import bump_membership_version
+from .models import (FavoriteRecipes, IngredientRecipe, Recipe, ShoppingList,
+                     ShoppingListIngredient)
+from core.models import Subscribe
+
+BATCH_SIZE = 1000
+RECIPE_COUNTERS = {
+    FavoriteRecipes: 'favorites_count',
+    ShoppingList: 'shopping_cart_count',
+}
+
+User = get_user_model()
+
+
+def ingredient_amounts(recipe_ids):
+    """Количество ингредиентов по рецептам: {recipe_id: {ingredient_id: n}}."""
+    amounts = defaultdict(lambda: defaultdict(int))
+    links = IngredientRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient_id', 'amount')
+    for recipe_id, ingredient_id, amount in links:
+        amounts[recipe_id][ingredient_id] += amount
+    return amounts
+
+
+def add_to_totals(rows):
+    """Прибавление к суммам: INSERT ... ON CONFLICT DO UPDATE.
+
+    rows: (user_id, ingredient_id, количество). Строка создается или
+    увеличивается одной операцией, поэтому прибавление не теряется,
+    даже если параллельная транзакция в этот момент удаляет строку.
+    """
+    quote = connection.ops.quote_name
+    table = quote(ShoppingListIngredient._meta.db_table)
+    columns = ('user_id', 'ingredient_id', 'amount')
+    batch_size = min(
+        BATCH_SIZE, connection.ops.bulk_batch_size(columns, rows)
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                f'INSERT INTO {table} '
+                f'({", ".join(quote(column) for column in columns)}) '
+                f'VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                f'ON CONFLICT ({quote("user_id")}, {quote("ingredient_id")}) '
+                f'DO UPDATE SET {quote("amount")} = '
+                f'{table}.{quote("amount")} + EXCLUDED.{quote("amount")}',
+                [value for row in batch for value in row]
+            )
+
+
+def apply_ingredient_deltas(user_ids, deltas):
+    """Изменение сумм ингредиентов в списках покупок пользователей.
+
+    deltas: {ingredient_id: изменение количества}. Прибавления - один
+    upsert (add_to_totals), вычитания - UPDATE по группам одинаковых
+    изменений, не ниже нуля, затем один DELETE строк с нулевой суммой.
+    Число запросов не зависит от числа ингредиентов; строки
+    обрабатываются в порядке (user_id, ingredient_id).
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    added = sorted(
+        (ingredient_id, delta)
+        for ingredient_id, delta in deltas.items() if delta > 0
+    )
+    removed = defaultdict(list)
+    for ingredient_id, delta in deltas.items():
+        if delta < 0:
+            removed[delta].append(ingredient_id)
+    if not added and not removed:
+        return
+    totals = ShoppingListIngredient.objects.filter(user_id__in=user_ids)
+    with transaction.atomic():
+        if added:
+            add_to_totals([
+                (user_id, ingredient_id, delta)
+                for user_id in user_ids
+                for ingredient_id, delta in added
+            ])
+        for delta, ingredient_ids in removed.items():
+            totals.filter(ingredient_id__in=ingredient_ids).update(
+                amount=Greatest(F('amount') + delta, 0)
+            )
+        if removed:
+            totals.filter(
+                ingredient_id__in=[
+                    ingredient_id
+                    for ingredient_ids in removed.values()
+                    for ingredient_id in ingredient_ids
+                ],
+                amount__lte=0,
+            ).delete()
+
+
+def change_shopping_list(user_ids, recipe_ids, sign):
+    """Добавление (sign=1) или удаление (sign=-1) рецептов из списков."""
+    deltas = defaultdict(int)
+    for amounts in ingredient_amounts(recipe_ids).values():
+        for ingredient_id, amount in amounts.items():
+            deltas[ingredient_id] += sign * amount
+    apply_ingredient_deltas(user_ids, deltas)
+
+
+def update_recipe_totals(recipe_id, old_amounts):
+    """Пересчет списков покупок после изменения ингредиентов рецепта.
+
+    old_amounts: состав рецепта до изменения, {ingredient_id: n}.
+    """
+    user_ids = ShoppingList.objects.filter(
+        recipe=recipe_id
+    ).values_list('user_id', flat=True)
+    new_amounts = ingredient_amounts([recipe_id])[recipe_id]
+    deltas = {
+        ingredient_id: (
+            new_amounts.get(ingredient_id, 0)
+            - old_amounts.get(ingredient_id, 0)
+        )
+        for ingredient_id in {*old_amounts, *new_amounts}
+    }
+    apply_ingredient_deltas(user_ids, deltas)
+
+
+def change_counter(model, object_id, field, delta):
+    """Изменение счетчика одним UPDATE с F() без чтения строки.
+
+    Счетчик не уходит ниже нуля, даже если разошелся с данными
+    до очередной сверки.
+    """
+    rows = model.objects.filter(id=object_id)
+    if delta < 0:
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    rows.update(**{field: F(field) + delta})
+
+
+def add_recipe_link(model, user_id, recipe_id):
+    """Добавление рецепта в избранное или список покупок.
+
+    model - FavoriteRecipes или ShoppingList. Вставка выполняется одним
+    INSERT ... ON CONFLICT DO NOTHING: при одновременных запросах строку
+    добавит только один из них, остальные получат False без ошибки
+    уникальности. Сигналы модели не отправляются, поэтому суммы
+    и версия наборов меняются здесь же, в той же транзакции.
+    """
+    quote = connection.ops.quote_name
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} '
+        f'({quote("user_id")}, {quote("recipe_id")}, {quote("created")}) '
+        'VALUES (%s, %s, %s) ON CONFLICT DO NOTHING'
+    )
+    created = connection.ops.adapt_datetimefield_value(timezone.now())
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, recipe_id, created])
+        added = cursor.rowcount == 1
+        if added:
+            if model is ShoppingList:
+                change_shopping_list([user_id], [recipe_id], 1)
+            change_counter(Recipe, recipe_id, RECIPE_COUNTERS[model], 1)
+            bump_membership_version(user_id)
+    return added
+
+
+def remove_recipe_link(model, user_id, recipe_id):
+    """Удаление рецепта из избранного или списка покупок.
+
+    Один DELETE без предварительной выборки строк; результат
+    определяется числом удаленных строк.
+    """
+    quote = connection.ops.quote_name
+    sql = (
+        f'DELETE FROM {quote(model._meta.db_table)} '
+        f'WHERE {quote("user_id")} = %s AND {quote("recipe_id")} = %s'
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, recipe_id])
+        removed = cursor.rowcount == 1
+        if removed:
+            if model is ShoppingList:
+                change_shopping_list([user_id], [recipe_id], -1)
+            change_counter(Recipe, recipe_id, RECIPE_COUNTERS[model], -1)
+            bump_membership_version(user_id)
+    return removed
+
+
+def rebuild_totals(user_ids=None):
+    """Полный пересчет сумм из IngredientRecipe. Возвращает число строк."""
+    if user_ids is None:
+        return _rebuild_totals()
+    return _rebuild_totals('in', user_ids)
+
+
+def rebuild_totals_by_range(first_id, last_id, step=BATCH_SIZE):
+    """Пересчет сумм пользователей с id от first_id до last_id.
+
+    Пользователи обрабатываются диапазонами по step id, каждый диапазон
+    в своей транзакции: число параметров запроса не растет вместе
+    с числом пользователей, а блокировки не держатся весь пересчет.
+    """
+    created = 0
+    for start in range(first_id, last_id + 1, step):
+        created += _rebuild_totals(
+            'range', (start, min(start + step - 1, last_id))
+        )
+    return created
+
+
+def _rebuild_totals(lookup=None, value=None):
+    totals = ShoppingListIngredient.objects.all()
+    # условия по списку покупок задаются одним filter(), иначе
+    # каждое из них добавит в запрос отдельный join
+    lookups = {'recipe__shopping_list__isnull': False}
+    if lookup is not None:
+        totals = totals.filter(**{f'user__id__{lookup}': value})
+        lookups[f'recipe__shopping_list__user__id__{lookup}'] = value
+    rows = IngredientRecipe.objects.filter(**lookups).values(
+        'recipe__shopping_list__user', 'ingredient'
+    ).annotate(total=Sum('amount')).order_by()
+    created = 0
+    batch = []
+    with transaction.atomic():
+        totals.delete()
+        for row in rows.iterator():
+            batch.append(ShoppingListIngredient(
+                user_id=row['recipe__shopping_list__user'],
+                ingredient_id=row['ingredient'],
+                amount=row['total'],
+            ))
+            if len(batch) >= BATCH_SIZE:
+                ShoppingListIngredient.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        ShoppingListIngredient.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def row_count(model, field):
+    """Подзапрос: число строк model, ссылающихся на текущий объект."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+COUNTERS = (
+    (Recipe, 'favorites_count', FavoriteRecipes, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingList, 'recipe'),
+    (User, 'subscribers_count', Subscribe, 'author'),
+    (User, 'recipes_count', Recipe, 'author'),
+)
+
+
+def reconcile_counters(batch_size=10000):
+    """Сверка счетчиков с данными диапазонами id.
+
+    Разошедшиеся строки находятся чтением, а исправляются UPDATE
+    с тем же подзапросом: значение считается в момент записи, поэтому
+    одновременные изменения счетчика не теряются. Возвращает
+    {счетчик: исправлено строк}.
+    """
+    fixed = {}
+    for model, field, source, source_field in COUNTERS:
+        fixed[f'{model._meta.model_name}.{field}'] = 0
+        last_id = model.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        for start in range(0, last_id + 1, batch_size):
+            rows = model.objects.filter(
+                id__gte=start, id__lt=start + batch_size
+            ).annotate(actual=row_count(source, source_field))
+            stale = [
+                object_id
+                for object_id, current, actual in rows.values_list(
+                    'id', field, 'actual'
+                )
+                if current != actual
+            ]
+            if stale:
+                model.objects.filter(id__in=stale).update(
+                    **{field: row_count(source, source_field)}
+                )
+            fixed[f'{model._meta.model_name}.{field}'] += len(stale)
+    return fixed
@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+
+from django.db import DatabaseError
+
+from .models import Recipe
+from core.replicas import primary
+
+ALPHABET = (
+    '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+)
+DIGITS = {char: value for value, char in enumerate(ALPHABET)}
+# коды длиннее не выпускаются: 62 ** 8 больше любого id рецепта
+MAX_CODE_LENGTH = 8
+# через сколько секунд повторять загрузку карты после ошибки базы
+WARM_RETRY_SECONDS = 30
+
+logger = logging.getLogger(__name__)
+
+
+def encode(recipe_id):
+    """Короткий код base62 для id рецепта."""
+    code = ''
+    while True:
+        recipe_id, digit = divmod(recipe_id, len(ALPHABET))
+        code = ALPHABET[digit] + code
+        if not recipe_id:
+            return code
+
+
+def decode(code):
+    """Id рецепта по коду; None, если код некорректен.
+
+    Ведущие нули не принимаются: у каждого рецепта один код.
+    """
+    if not code or len(code) > MAX_CODE_LENGTH:
+        return None
+    if code[0] == ALPHABET[0] and code != ALPHABET[0]:
+        return None
+    recipe_id = 0
+    for char in code:
+        digit = DIGITS.get(char)
+        if digit is None:
+            return None
+        recipe_id = recipe_id * len(ALPHABET) + digit
+    return recipe_id
+
+
+class ShortLinks:
+    """Известные id рецептов в памяти процесса для коротких ссылок.
+
+    Id хранятся битовой картой: миллион рецептов - около 125 КБ.
+    Новые и удаленные рецепты этого процесса отмечаются сигналами;
+    рецепт, созданный в другом процессе, проверяется в базе при первом
+    обращении. Удаленный в другом процессе рецепт остается в карте,
+    и ссылка ведет на страницу, которая сама покажет, что его нет.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._warm_lock = threading.Lock()
+        self._retry_at = 0.0
+        self._bits = None
+
+    def warm(self):
+        """Загрузка id рецептов; при недоступной базе - при обращении."""
+        with self._warm_lock:
+            self._load()
+
+    def _load(self):
+        bits = bytearray()
+        try:
+            with primary():
+                for recipe_id in Recipe.objects.values_list(
+                    'id', flat=True
+                ).iterator():
+                    self._set(bits, recipe_id)
+        except DatabaseError:
+            logger.warning('Карта коротких ссылок не загружена.')
+            self._retry_at = time.monotonic() + WARM_RETRY_SECONDS
+            return
+        with self._lock:
+            self._bits = bits
+
+    def _warm_if_idle(self):
+        """Загрузка при обращении, если ее не выполняет другой поток
+        и не идет пауза после ошибки; иначе запрос проверяет id в базе."""
+        if time.monotonic() < self._retry_at:
+            return
+        if not self._warm_lock.acquire(blocking=False):
+            return
+        try:
+            if self._bits is None:
+                self._load()
+        finally:
+            self._warm_lock.release()
+
+    def _set(self, bits, recipe_id):
+        index, bit = divmod(recipe_id, 8)
+        if index >= len(bits):
+            bits.extend(bytes(index - len(bits) + 1))
+        bits[index] |= 1 << bit
+
+    def add(self, recipe_id):
+        with self._lock:
+            if self._bits is not None:
+                self._set(self._bits, recipe_id)
+
+    def discard(self, recipe_id):
+        with self._lock:
+            index, bit = divmod(recipe_id, 8)
+            if self._bits is not None and index < len(self._bits):
+                self._bits[index] &= ~(1 << bit)
+
+    def exists(self, recipe_id):
+        """Есть ли рецепт: по карте, при промахе - по базе."""
+        if self._bits is None:
+            self._warm_if_idle()
+        bits = self._bits
+        if bits is not None:
+            index, bit = divmod(recipe_id, 8)
+            if index < len(bits) and bits[index] & (1 << bit):
+                return True
+        with primary():
+            found = Recipe.objects.filter(id=recipe_id).exists()
+        if found:
+            self.add(recipe_id)
+        return found
+
+
+short_links = ShortLinks()
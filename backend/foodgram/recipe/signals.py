@@ -0,0 +1,157 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from .catalog import INGREDIENTS, TAGS, bump_catalog_version
+from .membership import bump_membership_version
+from .models import (FavoriteRecipes, Ingredient, IngredientRecipe, Recipe,
+                     ShoppingList, Tag)
+from .services import RECIPE_COUNTERS, change_counter, change_shopping_list
+from .shortlinks import short_links
+from .versions import AUTHOR, RECIPE, bump_versions
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=ShoppingList)
+def shopping_list_added(sender, instance, created, **kwargs):
+    """Добавление ингредиентов рецепта в суммы списка покупок."""
+    if created:
+        change_shopping_list([instance.user_id], [instance.recipe_id], 1)
+
+
+@receiver(pre_delete, sender=ShoppingList)
+def shopping_list_removed(sender, instance, **kwargs):
+    """Вычитание ингредиентов рецепта из сумм списка покупок.
+
+    Вызывается до удаления: при каскадном удалении рецепта его
+    ингредиенты удаляются в той же операции.
+    """
+    change_shopping_list([instance.user_id], [instance.recipe_id], -1)
+
+
+@receiver(post_save, sender=FavoriteRecipes)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=FavoriteRecipes)
+@receiver(post_delete, sender=ShoppingList)
+def membership_changed(sender, instance, **kwargs):
+    """Сброс кешированных наборов избранного и корзины пользователя."""
+    bump_membership_version(instance.user_id)
+
+
+@receiver(post_save, sender=FavoriteRecipes)
+@receiver(post_save, sender=ShoppingList)
+def recipe_counter_added(sender, instance, created, **kwargs):
+    """Счетчик рецепта при добавлении через ORM (админка, команды)."""
+    if created:
+        change_counter(Recipe, instance.recipe_id, RECIPE_COUNTERS[sender], 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipes)
+@receiver(post_delete, sender=ShoppingList)
+def recipe_counter_removed(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, RECIPE_COUNTERS[sender], -1)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    """Сброс кеша справочника и индекса автодополнения ингредиентов."""
+    bump_catalog_version(INGREDIENTS)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    """Сброс кеша справочника тегов."""
+    bump_catalog_version(TAGS)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_recipes_changed(sender, instance, created, **kwargs):
+    """Сброс представлений рецептов, в которые встроен ингредиент.
+
+    При удалении ингредиента его строки в рецептах удаляются каскадом
+    и сбрасывают представления сами.
+    """
+    if not created:
+        bump_versions(RECIPE, IngredientRecipe.objects.filter(
+            ingredient=instance
+        ).values_list('recipe_id', flat=True))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_recipes_changed(sender, instance, created=False, **kwargs):
+    """Сброс представлений рецептов с измененным или удаленным тегом.
+
+    При удалении рецепты берутся до каскадного удаления связей.
+    """
+    if not created:
+        bump_versions(
+            RECIPE, instance.recipe.values_list('id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    """Сброс кешированного представления рецепта."""
+    bump_versions(RECIPE, [instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+def author_recipe_added(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def author_recipe_removed(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_short_link_created(sender, instance, created, **kwargs):
+    if created:
+        short_links.add(instance.id)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_short_link_deleted(sender, instance, **kwargs):
+    short_links.discard(instance.id)
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    """Сброс представления при изменении ингредиентов рецепта."""
+    bump_versions(RECIPE, [instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сброс представления при изменении тегов рецепта."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        bump_versions(RECIPE, [instance.pk])
+    elif pk_set is not None:
+        bump_versions(RECIPE, pk_set)
+    else:
+        # instance - тег, рецепты берутся до очистки связей
+        bump_versions(
+            RECIPE, instance.recipe.values_list('id', flat=True)
+        )
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, update_fields=None, **kwargs):
+    """Сброс представлений рецептов при изменении профиля автора.
+
+    Обновление только last_login при входе не меняет профиль.
+    """
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_versions(AUTHOR, [instance.pk])
@@ -0,0 +1,54 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+RECIPE = 'recipe'
+AUTHOR = 'author'
+
+
+def _version_key(kind, object_id):
+    return f'{kind}:{object_id}:version'
+
+
+def get_versions(kind, object_ids):
+    """Текущие версии объектов: {id: версия}.
+
+    Версия меняется при изменении данных, от которых зависит
+    кешированное представление объекта.
+    """
+    keys = {
+        _version_key(kind, object_id): object_id for object_id in object_ids
+    }
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, None)
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def get_version(kind, object_id):
+    return get_versions(kind, [object_id])[object_id]
+
+
+def bump_versions(kind, object_ids):
+    """Смена версий после фиксации транзакции.
+
+    Если сменить версию раньше, параллельный запрос может закешировать
+    под новой версией еще не измененные данные.
+    """
+    object_ids = list(object_ids)
+    if not object_ids:
+        return
+
+    def bump():
+        cache.set_many(
+            {
+                _version_key(kind, object_id): uuid.uuid4().hex
+                for object_id in object_ids
+            },
+            None
+        )
+    transaction.on_commit(bump)
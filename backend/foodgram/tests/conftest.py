@@ -0,0 +1,123 @@
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import token_cache
+from core.models import Subscribe, User
+from recipe.catalog import catalog_responses
+from recipe.models import Ingredient, IngredientRecipe, Recipe, Tag
+
+INGREDIENTS_PER_RECIPE = 3
+REPLICA = 'replica_1'
+
+
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix):
+    """Реплика SQLite, как с SQLITE_REPLICA в dev-режиме.
+
+    Реплика - зеркало тестовой базы через отдельное соединение: она
+    не видит незафиксированную транзакцию теста, то есть отстает
+    на все записи теста. Чтения уходят в нее, только если тест
+    задает DATABASE_REPLICAS.
+    """
+    settings.DATABASES[REPLICA] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': settings.BASE_DIR / 'replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+    # список подключений пересчитывается с новым псевдонимом
+    connections.__dict__.pop('settings', None)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Кеши процесса и кеш Django не переходят между тестами."""
+    cache.clear()
+    token_cache._items.clear()
+    catalog_responses._items.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        username='reader', email='reader@example.com', password='pass1234'
+    )
+
+
+@pytest.fixture
+def token(user):
+    return Token.objects.create(user=user)
+
+
+@pytest.fixture
+def anonymous_client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def tags(db):
+    return [
+        Tag.objects.create(name=f'Тег {number}', slug=f'tag-{number}')
+        for number in range(2)
+    ]
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredient.objects.create(
+            name=f'Ингредиент {number}', measurement_unit='г'
+        )
+        for number in range(INGREDIENTS_PER_RECIPE)
+    ]
+
+
+@pytest.fixture
+def make_recipes(tags, ingredients):
+    """Рецепты автора с тегами и ингредиентами."""
+    def make_recipes(author, count):
+        recipes = []
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                author=author, name=f'{author.username} {number}',
+                text='-', cooking_time=10, image='recipes/test.png'
+            )
+            recipe.tags.set(tags)
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+                for ingredient in ingredients
+            )
+            recipes.append(recipe)
+        return recipes
+    return make_recipes
+
+
+@pytest.fixture
+def make_authors(db):
+    def make_authors(count, subscriber=None):
+        authors = [
+            User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com'
+            )
+            for number in range(count)
+        ]
+        if subscriber is not None:
+            for author in authors:
+                Subscribe.objects.create(subscriber=subscriber, author=author)
+        return authors
+    return make_authors
@@ -0,0 +1,33 @@
+import asyncio
+import threading
+
+from api.async_views import StreamingASGIHandler, pull_in_pool
+from django.http import StreamingHttpResponse
+
+
+def test_streaming_response_is_pulled_in_pool():
+    """Блоки потокового ответа читаются в потоках пула по одному,
+    а не в цикле событий и не целиком."""
+    pulled = []
+
+    def parts():
+        for number in range(3):
+            pulled.append(threading.current_thread().name)
+            yield f'{number};'
+
+    response = StreamingHttpResponse(parts(), content_type='text/plain')
+    response.async_streaming_content = pull_in_pool(iter(response))
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(StreamingASGIHandler().send_response(response, send))
+
+    assert messages[0]['status'] == 200
+    assert (b'Content-Type', b'text/plain') in messages[0]['headers']
+    assert [message.get('body') for message in messages[1:]] == [
+        b'0;', b'1;', b'2;', None
+    ]
+    assert len(pulled) == 3
+    assert all(name.startswith('orm') for name in pulled)
@@ -0,0 +1,65 @@
+import pytest
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.authentication import token_cache
+
+ME_URL = '/api/users/me/'
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(params=[False, True], ids=['local', 'shared'])
+def other_worker(request, monkeypatch, user_client):
+    """Токен закеширован в процессе, который не получает сигналов.
+
+    Сигналы сбрасывают записи только своего процесса, поэтому их
+    удаление отключено: запись остается, как в другом воркере.
+    """
+    with override_settings(AUTH_TOKEN_SHARED_CACHE=request.param):
+        assert user_client.get(ME_URL).status_code == 200
+        monkeypatch.setattr(token_cache, 'delete', lambda keys: None)
+        yield user_client
+
+
+def test_cached_token_skips_database(user_client):
+    user_client.get(ME_URL)
+    with CaptureQueriesContext(connection) as queries:
+        assert user_client.get(ME_URL).status_code == 200
+    assert not any(
+        'authtoken_token' in query['sql']
+        for query in queries.captured_queries
+    )
+
+
+def test_logout_revokes_cached_token(other_worker,
+                                     django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = other_worker.post('/api/auth/token/logout/')
+    assert response.status_code == 204
+    assert other_worker.get(ME_URL).status_code == 401
+
+
+def test_deactivation_revokes_cached_token(other_worker, user,
+                                           django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        user.is_active = False
+        user.save()
+    assert other_worker.get(ME_URL).status_code == 401
+
+
+def test_password_change_refreshes_cached_user(
+    other_worker, django_capture_on_commit_callbacks
+):
+    """После смены пароля запрос видит новый хеш, а не закешированный."""
+    url = '/api/users/set_password/'
+    with django_capture_on_commit_callbacks(execute=True):
+        response = other_worker.post(url, {
+            'current_password': 'pass1234', 'new_password': 'pass5678'
+        })
+    assert response.status_code == 204
+    response = other_worker.post(url, {
+        'current_password': 'pass5678', 'new_password': 'pass9012'
+    })
+    assert response.status_code == 204
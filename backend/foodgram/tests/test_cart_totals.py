@@ -0,0 +1,131 @@
+import pytest
+from django.db.models import Sum
+
+from recipe.models import (Ingredient, IngredientRecipe, ShoppingList,
+                           ShoppingListIngredient)
+
+
+def stored_totals(user):
+    return dict(ShoppingListIngredient.objects.filter(
+        user=user
+    ).values_list('ingredient_id', 'amount'))
+
+
+def expected_totals(user):
+    """Суммы списка покупок, посчитанные заново из IngredientRecipe."""
+    return dict(IngredientRecipe.objects.filter(
+        recipe__shopping_list__user=user
+    ).values('ingredient').annotate(total=Sum('amount')).values_list(
+        'ingredient', 'total'
+    ))
+
+
+@pytest.fixture
+def new_ingredient(db):
+    return Ingredient.objects.create(name='Перец', measurement_unit='г')
+
+
+@pytest.mark.django_db
+def test_totals_follow_cart(user, user_client, make_recipes):
+    """Суммы сходятся с пересчетом после добавления и удаления."""
+    recipes = make_recipes(user, 3)
+    for recipe in recipes:
+        response = user_client.post(
+            f'/api/recipes/{recipe.id}/shopping_cart/'
+        )
+        assert response.status_code == 201
+        assert stored_totals(user) == expected_totals(user)
+    for recipe in recipes:
+        response = user_client.delete(
+            f'/api/recipes/{recipe.id}/shopping_cart/'
+        )
+        assert response.status_code == 204
+        assert stored_totals(user) == expected_totals(user)
+    assert stored_totals(user) == {}
+
+
+@pytest.mark.django_db
+def test_totals_follow_recipe_update(user, user_client, django_user_model,
+                                     make_recipes, tags, ingredients,
+                                     new_ingredient):
+    """Изменение ингредиентов рецепта в корзине меняет суммы всех,
+    у кого он в корзине."""
+    other = django_user_model.objects.create_user(
+        username='other', email='other@example.com'
+    )
+    edited, kept = make_recipes(user, 2)
+    for owner in (user, other):
+        ShoppingList.objects.create(user=owner, recipe=edited)
+    ShoppingList.objects.create(user=user, recipe=kept)
+
+    response = user_client.patch(
+        f'/api/recipes/{edited.id}/', {
+            'name': edited.name,
+            'text': edited.text,
+            'cooking_time': edited.cooking_time,
+            'tags': [tag.id for tag in tags],
+            'ingredients': [
+                {'id': ingredients[0].id, 'amount': 50},
+                {'id': new_ingredient.id, 'amount': 3},
+            ],
+        }, format='json'
+    )
+
+    assert response.status_code == 200
+    for owner in (user, other):
+        assert stored_totals(owner) == expected_totals(owner)
+    assert stored_totals(other) == {
+        ingredients[0].id: 50, new_ingredient.id: 3
+    }
+
+
+@pytest.mark.django_db
+def test_totals_follow_admin_edit(user, client, django_user_model,
+                                  make_recipes, tags, ingredients,
+                                  new_ingredient):
+    """Сохранение рецепта в админке пересчитывает суммы корзин."""
+    admin = django_user_model.objects.create_superuser(
+        username='admin', email='admin@example.com', password='pass1234'
+    )
+    client.force_login(admin)
+    edited, kept = make_recipes(user, 2)
+    ShoppingList.objects.create(user=user, recipe=edited)
+    ShoppingList.objects.create(user=user, recipe=kept)
+    links = list(edited.ingredient_links.order_by('id'))
+    prefix = 'ingredient_links'
+    data = {
+        'author': user.id,
+        'name': edited.name,
+        'text': edited.text,
+        'cooking_time': edited.cooking_time,
+        'tags': [tag.id for tag in tags],
+        f'{prefix}-TOTAL_FORMS': len(links) + 1,
+        f'{prefix}-INITIAL_FORMS': len(links),
+        f'{prefix}-MIN_NUM_FORMS': 0,
+        f'{prefix}-MAX_NUM_FORMS': 1000,
+        # новая строка
+        f'{prefix}-{len(links)}-recipe': edited.id,
+        f'{prefix}-{len(links)}-ingredient': new_ingredient.id,
+        f'{prefix}-{len(links)}-amount': 4,
+        '_save': 'Сохранить',
+    }
+    for number, link in enumerate(links):
+        data.update({
+            f'{prefix}-{number}-id': link.id,
+            f'{prefix}-{number}-recipe': edited.id,
+            f'{prefix}-{number}-ingredient': link.ingredient_id,
+            f'{prefix}-{number}-amount': link.amount + 10,
+        })
+    # первая строка удаляется
+    data[f'{prefix}-0-DELETE'] = 'on'
+
+    response = client.post(
+        f'/admin/recipe/recipe/{edited.id}/change/', data
+    )
+
+    assert response.status_code == 302
+    assert not edited.ingredient_links.filter(
+        ingredient=ingredients[0]
+    ).exists()
+    assert stored_totals(user) == expected_totals(user)
+    assert new_ingredient.id in stored_totals(user)
@@ -0,0 +1,54 @@
+import pytest
+from django.core.cache import cache
+from django.test import override_settings
+
+from core.caches import version_timeout
+from recipe.catalog import catalog_responses
+from recipe.models import Tag
+
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/tmp/foodgram_test_cache',
+    }
+}
+
+
+def test_version_timeout_local_cache(settings):
+    """Версии в кеше процесса истекают, в общем кеше - бессрочны."""
+    assert version_timeout() == settings.LOCAL_CACHE_VERSION_TIMEOUT
+    with override_settings(CACHES=SHARED_CACHES):
+        assert version_timeout() is None
+
+
+@pytest.mark.django_db
+def test_tags_etag(anonymous_client, tags):
+    """Повтор с ETag получает 304, после изменения тегов - новый ответ."""
+    response = anonymous_client.get('/api/tags/')
+    etag = response['ETag']
+    assert response.status_code == 200
+
+    response = anonymous_client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+    Tag.objects.create(name='Новый', slug='new')
+    response = anonymous_client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    assert len(response.json()) == len(tags) + 1
+
+
+@pytest.mark.django_db
+def test_tags_etag_follows_content(anonymous_client, tags):
+    """ETag не зависит от версии: после ее истечения и в другом
+    процессе неизмененный справочник дает тот же ETag и 304."""
+    response = anonymous_client.get('/api/tags/')
+    etag = response['ETag']
+    assert not response.has_header('Last-Modified')
+
+    # версия истекла, кеш ответов - как у только что запущенного воркера
+    cache.clear()
+    catalog_responses._items.clear()
+    response = anonymous_client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response['ETag'] == etag
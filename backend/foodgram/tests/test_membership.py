@@ -0,0 +1,67 @@
+import pytest
+from django.core.checks import run_checks
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from recipe.models import FavoriteRecipes, ShoppingList
+
+
+@pytest.fixture
+def recipes(user, make_recipes):
+    recipes = make_recipes(user, 4)
+    FavoriteRecipes.objects.create(user=user, recipe=recipes[0])
+    ShoppingList.objects.create(user=user, recipe=recipes[1])
+    return recipes
+
+
+def result_ids(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == 200
+    return {recipe['id'] for recipe in response.json()['results']}, queries
+
+
+@pytest.mark.django_db
+def test_membership_filters(user_client, recipes):
+    """Фильтры выполняются подзапросом EXISTS, а не списком id."""
+    favorites, queries = result_ids(
+        user_client, '/api/recipes/?is_favorited=1'
+    )
+    assert favorites == {recipes[0].id}
+    assert any(
+        'EXISTS' in query['sql'] and 'favoriterecipes' in query['sql']
+        for query in queries.captured_queries
+    )
+    others, _ = result_ids(user_client, '/api/recipes/?is_favorited=0')
+    assert others == {recipe.id for recipe in recipes[1:]}
+    cart, _ = result_ids(user_client, '/api/recipes/?is_in_shopping_cart=1')
+    assert cart == {recipes[1].id}
+
+
+@pytest.mark.django_db
+def test_membership_filters_anonymous(anonymous_client, recipes):
+    cart, _ = result_ids(
+        anonymous_client, '/api/recipes/?is_in_shopping_cart=1'
+    )
+    assert cart == set()
+    favorites, _ = result_ids(anonymous_client, '/api/recipes/?is_favorited=1')
+    assert favorites == {recipe.id for recipe in recipes}
+
+
+@pytest.mark.django_db
+def test_flags_follow_toggles(user_client, recipes,
+                              django_capture_on_commit_callbacks):
+    """Версия наборов меняется после фиксации изменения избранного."""
+    url = f'/api/recipes/{recipes[2].id}/'
+    assert not user_client.get(url).json()['is_favorited']
+    with django_capture_on_commit_callbacks(execute=True):
+        user_client.post(f'{url}favorite/')
+    assert user_client.get(url).json()['is_favorited']
+
+
+def test_several_workers_require_shared_cache():
+    with override_settings(WEB_CONCURRENCY=2):
+        errors = run_checks()
+    assert [error.id for error in errors] == ['core.E001']
+    assert run_checks() == []
@@ -0,0 +1,27 @@
+import re
+
+import pytest
+from api.metrics import registry
+
+
+def server_timing(response):
+    return {
+        name: float(duration)
+        for name, duration in re.findall(
+            r'(\w+);dur=([\d.]+)', response['Server-Timing']
+        )
+    }
+
+
+@pytest.mark.django_db
+def test_serialization_timed_separately(anonymous_client, user,
+                                        make_recipes):
+    """Сериализация в вью и рендеринг JSON замеряются отдельно."""
+    make_recipes(user, 6)
+    response = anonymous_client.get('/api/recipes/')
+    timing = server_timing(response)
+    assert timing['serialize'] > 0
+    assert timing['render'] > 0
+    assert timing['serialize'] + timing['render'] <= timing['total']
+    stats = registry._routes[('RecipeViewset.list', 'GET')]
+    assert stats.serialize_duration > 0
@@ -0,0 +1,64 @@
+import pytest
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+# счетчики пользователя (core 0004) появляются позже переноса
+CORE = ('core', '0003_alter_user_avatar')
+BEFORE = [CORE, ('recipe', '0004_recipe_created_id_idx')]
+AFTER = [CORE, ('recipe', '0005_swap_favorite_shopping_list')]
+
+
+def migrate(targets):
+    """Состояние приложений после миграции к targets."""
+    executor = MigrationExecutor(connection)
+    executor.loader.build_graph()
+    executor.migrate(targets)
+    return executor.loader.project_state(targets).apps
+
+
+@pytest.fixture
+def migrator():
+    yield migrate
+    migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+
+@pytest.mark.django_db(transaction=True)
+def test_favorites_and_cart_survive_direct_tables(migrator):
+    """Связи избранного и корзины переносятся из m2m в таблицы
+    (пользователь, рецепт) без потерь и дублей."""
+    apps = migrator(BEFORE)
+    User = apps.get_model('core', 'User')
+    Recipe = apps.get_model('recipe', 'Recipe')
+    users = [
+        User.objects.create(username=f'user{number}',
+                            email=f'user{number}@example.com')
+        for number in range(2)
+    ]
+    recipes = [
+        Recipe.objects.create(
+            author=users[0], name=f'Рецепт {number}', text='-',
+            cooking_time=1, image='recipes/test.png'
+        )
+        for number in range(3)
+    ]
+    expected = {}
+    for model_name, links in (
+        ('FavoriteRecipes', {(0, 0), (0, 1), (1, 2)}),
+        ('ShoppingList', {(0, 2), (1, 0), (1, 1)}),
+    ):
+        Model = apps.get_model('recipe', model_name)
+        for user_number in {user for user, _ in links}:
+            Model.objects.create(user=users[user_number]).recipes.set([
+                recipes[recipe] for user, recipe in links
+                if user == user_number
+            ])
+        expected[model_name] = {
+            (users[user].id, recipes[recipe].id) for user, recipe in links
+        }
+
+    apps = migrator(AFTER)
+    for model_name, links in expected.items():
+        rows = apps.get_model('recipe', model_name).objects.values_list(
+            'user_id', 'recipe_id'
+        )
+        assert sorted(rows) == sorted(links)
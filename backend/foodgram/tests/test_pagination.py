@@ -0,0 +1,56 @@
+import pytest
+
+from recipe.models import Recipe
+
+URL = '/api/recipes/'
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def recipes(user, make_recipes):
+    """Рецепты с повторяющимися значениями счетчика избранного."""
+    recipes = make_recipes(user, 14)
+    for number, recipe in enumerate(recipes):
+        Recipe.objects.filter(id=recipe.id).update(
+            favorites_count=number % 4
+        )
+    return Recipe.objects.all()
+
+
+def all_pages(client, url):
+    ids = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200, response.data
+        ids += [recipe['id'] for recipe in response.data['results']]
+        url = response.data['next']
+    return ids
+
+
+@pytest.mark.parametrize('ordering, order_by', [
+    ('', ('-created', '-id')),
+    ('-favorites', ('-favorites_count', '-id')),
+    ('favorites', ('favorites_count', 'id')),
+    ('created', ('created', 'id')),
+])
+def test_cursor_follows_ordering(anonymous_client, recipes, ordering,
+                                 order_by):
+    url = f'{URL}?cursor=' + (f'&ordering={ordering}' if ordering else '')
+    assert all_pages(anonymous_client, url) == list(
+        recipes.order_by(*order_by).values_list('id', flat=True)
+    )
+
+
+def test_cursor_rejects_unsupported_ordering(anonymous_client, recipes):
+    response = anonymous_client.get(
+        f'{URL}?cursor=&ordering=-favorites,created'
+    )
+    assert response.status_code == 400
+    assert 'cursor' in response.data
+
+
+def test_cursor_of_other_ordering_is_invalid(anonymous_client, recipes):
+    next_url = anonymous_client.get(f'{URL}?cursor=').data['next']
+    response = anonymous_client.get(f'{next_url}&ordering=-favorites')
+    assert response.status_code == 404
@@ -0,0 +1,71 @@
+import pytest
+
+from recipe.models import FavoriteRecipes, ShoppingList
+
+PAGE_SIZE = 6
+
+
+@pytest.fixture
+def feed(user, make_authors, make_recipes):
+    """Авторы с рецептами; часть рецептов в избранном и корзине читателя."""
+    def feed(authors_count, recipes_per_author):
+        authors = make_authors(authors_count, subscriber=user)
+        for author in authors:
+            for recipe in make_recipes(author, recipes_per_author)[::2]:
+                FavoriteRecipes.objects.create(user=user, recipe=recipe)
+                ShoppingList.objects.create(user=user, recipe=recipe)
+        return authors
+    return feed
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('recipes_count', [1, PAGE_SIZE])
+def test_recipe_list_anonymous(anonymous_client, feed, recipes_count,
+                               django_assert_num_queries):
+    """COUNT, страница рецептов с автором, теги, связи, ингредиенты."""
+    feed(1, recipes_count)
+    with django_assert_num_queries(5):
+        response = anonymous_client.get('/api/recipes/')
+    assert response.status_code == 200
+    assert len(response.json()['results']) == recipes_count
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('recipes_count', [1, PAGE_SIZE])
+def test_recipe_list_authenticated(user_client, feed, recipes_count,
+                                   django_assert_num_queries):
+    """К запросам анонимного списка добавляются токен и наборы
+    избранного и корзины; подписка на автора - подзапрос в списке."""
+    feed(2, recipes_count)
+    with django_assert_num_queries(8):
+        response = user_client.get('/api/recipes/')
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert len(results) == min(2 * recipes_count, PAGE_SIZE)
+    assert all(recipe['author']['is_subscribed'] for recipe in results)
+    assert any(recipe['is_favorited'] for recipe in results)
+    assert any(recipe['is_in_shopping_cart'] for recipe in results)
+
+    # токен и наборы уже в кеше
+    with django_assert_num_queries(5):
+        user_client.get('/api/recipes/')
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('authors_count', [1, PAGE_SIZE])
+@pytest.mark.parametrize('recipes_limit', [1, 3])
+def test_subscriptions(user_client, feed, authors_count, recipes_limit,
+                       django_assert_num_queries):
+    """Токен, COUNT, подписки с авторами и рецепты всех авторов."""
+    feed(authors_count, 4)
+    with django_assert_num_queries(4):
+        response = user_client.get(
+            f'/api/users/subscriptions/?recipes_limit={recipes_limit}'
+        )
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert len(results) == authors_count
+    for author in results:
+        assert author['recipes_count'] == 4
+        assert len(author['recipes']) == recipes_limit
+        assert author['is_subscribed']
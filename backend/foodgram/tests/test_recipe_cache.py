@@ -0,0 +1,56 @@
+import time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipe.models import Ingredient, Tag
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def recipe(user, make_recipes, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        return make_recipes(user, 1)[0]
+
+
+def get_detail(client, recipe):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(f'/api/recipes/{recipe.id}/')
+    assert response.status_code == 200
+    return response.json(), queries
+
+
+def test_detail_cached_after_local_version_timeout(anonymous_client, recipe,
+                                                   monkeypatch, settings):
+    """Истечение версий справочников в кеше процесса не сбрасывает
+    закешированные рецепты."""
+    get_detail(anonymous_client, recipe)
+    later = time.time() + settings.LOCAL_CACHE_VERSION_TIMEOUT + 1
+    monkeypatch.setattr(time, 'time', lambda: later)
+    _, queries = get_detail(anonymous_client, recipe)
+    assert not any(
+        'recipe_recipe' in query['sql'] for query in queries.captured_queries
+    )
+
+
+@pytest.mark.parametrize('model, field', [
+    (Tag, 'tags'), (Ingredient, 'ingredients'),
+])
+def test_detail_follows_embedded_catalog(anonymous_client, recipe, model,
+                                         field,
+                                         django_capture_on_commit_callbacks):
+    """Переименование тега или ингредиента меняет представление
+    рецептов, в которые он встроен."""
+    get_detail(anonymous_client, recipe)
+    item = model.objects.first()
+    with django_capture_on_commit_callbacks(execute=True):
+        item.name = 'Новое название'
+        item.save()
+    data, _ = get_detail(anonymous_client, recipe)
+    assert 'Новое название' in {value['name'] for value in data[field]}
+
+
+def test_cache_max_entries(settings):
+    assert settings.CACHES['default']['OPTIONS']['MAX_ENTRIES'] >= 10000
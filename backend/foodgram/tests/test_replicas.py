@@ -0,0 +1,64 @@
+import pytest
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from .conftest import REPLICA
+from core.replicas import STICKY_COOKIE
+
+# кеш другого воркера: флаг записи в нем не виден
+OTHER_WORKER_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'other-worker',
+    }
+}
+
+pytestmark = [
+    pytest.mark.django_db(databases=['default', REPLICA]),
+    pytest.mark.usefixtures('with_replica'),
+]
+
+
+@pytest.fixture
+def with_replica():
+    with override_settings(DATABASE_REPLICAS=[REPLICA]):
+        yield
+
+
+@pytest.fixture
+def recipe(user, make_recipes):
+    return make_recipes(user, 1)[0]
+
+
+def add_favorite(client, recipe):
+    response = client.post(f'/api/recipes/{recipe.id}/favorite/')
+    assert response.status_code == 201
+    return response
+
+
+def test_reads_after_write_go_to_primary(user_client, recipe):
+    """После записи клиент с кукой читает свои изменения из основной
+    базы, даже если флаг в кеше воркера не виден."""
+    response = add_favorite(user_client, recipe)
+    assert STICKY_COOKIE in response.cookies
+    with override_settings(CACHES=OTHER_WORKER_CACHES):
+        assert user_client.get('/api/recipes/').data['count'] == 1
+
+
+def test_reads_without_write_go_to_replica(user_client, token, recipe):
+    """Без недавней записи чтение идет в отстающую реплику."""
+    add_favorite(user_client, recipe)
+    with override_settings(CACHES=OTHER_WORKER_CACHES):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert client.get('/api/recipes/').data['count'] == 0
+
+
+def test_forged_cookie_is_ignored(user_client, token, recipe):
+    """Кука без подписи не переводит чтения в основную базу."""
+    add_favorite(user_client, recipe)
+    with override_settings(CACHES=OTHER_WORKER_CACHES):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        client.cookies[STICKY_COOKIE] = str(token.user_id)
+        assert client.get('/api/recipes/').data['count'] == 0
@@ -0,0 +1,88 @@
+import pytest
+from django.db import connection
+
+from recipe.models import Recipe
+from recipe.search import SEARCH_TRIGGERS
+
+URL = '/api/recipes/'
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def recipes(user, make_authors, tags):
+    """Борщ с первым тегом у user, блины со вторым у другого автора."""
+    other, = make_authors(1)
+    borscht = Recipe.objects.create(
+        author=user, name='Борщ украинский', text='Свекла и капуста',
+        cooking_time=90, image='recipes/test.png'
+    )
+    borscht.tags.set([tags[0]])
+    pancakes = Recipe.objects.create(
+        author=other, name='Блины', text='Тонкие, на молоке',
+        cooking_time=30, image='recipes/test.png'
+    )
+    pancakes.tags.set([tags[1]])
+    return borscht, pancakes
+
+
+def found(client, query):
+    response = client.get(f'{URL}?{query}')
+    assert response.status_code == 200, response.data
+    return [recipe['name'] for recipe in response.data['results']]
+
+
+def test_search_triggers_survive_migrations():
+    """Миграции, пересоздающие таблицу рецептов в SQLite, удаляют
+    триггеры индекса; последняя такая миграция должна их вернуть."""
+    if connection.vendor != 'sqlite':
+        pytest.skip('триггеры поиска есть только в SQLite')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+        )
+        triggers = {name for name, in cursor.fetchall()}
+    assert triggers.issuperset(SEARCH_TRIGGERS)
+
+
+@pytest.mark.parametrize('query, names', [
+    ('search=борщ', ['Борщ украинский']),
+    ('search=бор', ['Борщ украинский']),
+    ('search=укр бор', ['Борщ украинский']),
+    ('search=молоке', ['Блины']),
+    ('search=борщ блины', []),
+    ('search="*', []),
+])
+def test_search_matches_word_prefixes(anonymous_client, recipes, query,
+                                      names):
+    assert found(anonymous_client, query) == names
+
+
+def test_search_follows_recipe_changes(anonymous_client, recipes):
+    borscht, pancakes = recipes
+    borscht.name = 'Щи'
+    borscht.save()
+    pancakes.delete()
+    assert found(anonymous_client, 'search=борщ') == []
+    assert found(anonymous_client, 'search=щи') == ['Щи']
+    assert found(anonymous_client, 'search=блины') == []
+
+
+def test_search_combines_with_filters(anonymous_client, recipes, user, tags):
+    assert found(
+        anonymous_client, f'search=борщ&tags={tags[0].slug}'
+    ) == ['Борщ украинский']
+    assert found(anonymous_client, f'search=борщ&tags={tags[1].slug}') == []
+    assert found(
+        anonymous_client, f'search=борщ&author={user.id}'
+    ) == ['Борщ украинский']
+    assert found(
+        anonymous_client, f'search=блины&author={user.id}'
+    ) == []
+
+
+def test_search_with_cursor_is_rejected(anonymous_client, recipes):
+    """Порядок по релевантности не поддерживается курсором."""
+    response = anonymous_client.get(f'{URL}?search=борщ&cursor=')
+    assert response.status_code == 400
+    assert 'cursor' in response.data
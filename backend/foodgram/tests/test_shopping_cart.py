@@ -0,0 +1,28 @@
+import pytest
+from api.shopping_cart import in_batches
+
+from recipe.models import Ingredient, ShoppingListIngredient
+
+
+@pytest.mark.django_db
+def test_in_batches_reads_every_row_in_name_order(user):
+    """Пачки по ключу (название, id) не теряют и не повторяют строки
+    с одинаковыми названиями на границе пачек."""
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f'Соль {number % 2}', measurement_unit=f'{number} г')
+        for number in range(7)
+    )
+    ShoppingListIngredient.objects.bulk_create(
+        ShoppingListIngredient(user=user, ingredient=ingredient, amount=1)
+        for ingredient in Ingredient.objects.all()
+    )
+    rows = list(in_batches(
+        ShoppingListIngredient.objects.filter(user=user).values(
+            'ingredient_id', 'ingredient__name'
+        ),
+        size=2
+    ))
+    assert len(rows) == len(ingredients)
+    assert [
+        (row['ingredient__name'], row['ingredient_id']) for row in rows
+    ] == sorted(Ingredient.objects.values_list('name', 'id'))
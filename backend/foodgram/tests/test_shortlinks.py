@@ -0,0 +1,53 @@
+import pytest
+from django.db import DatabaseError
+
+from recipe.models import Recipe
+from recipe.shortlinks import ShortLinks, decode, encode
+
+
+@pytest.mark.parametrize('recipe_id', [0, 1, 61, 62, 3844, 10 ** 9])
+def test_code_round_trip(recipe_id):
+    assert decode(encode(recipe_id)) == recipe_id
+
+
+@pytest.mark.parametrize('code', ['00', '01', '0a', '', 'a-b', 'a' * 9])
+def test_decode_rejects_aliases_and_garbage(code):
+    assert decode(code) is None
+
+
+def test_leading_zero_alias_is_not_found(client):
+    assert client.get('/s/0' + encode(1)).status_code == 404
+
+
+@pytest.fixture
+def failing_warm(monkeypatch):
+    """Загрузка карты падает с ошибкой базы; счетчик попыток."""
+    attempts = []
+
+    def values_list(*args, **kwargs):
+        attempts.append(1)
+        raise DatabaseError
+
+    monkeypatch.setattr(Recipe.objects, 'values_list', values_list)
+    return attempts
+
+
+@pytest.mark.django_db
+def test_failed_warm_backs_off(failing_warm, user, make_recipes):
+    """После ошибки загрузка не повторяется на каждом запросе,
+    а id проверяются в базе."""
+    recipe = make_recipes(user, 1)[0]
+    links = ShortLinks()
+    links.warm()
+    assert links.exists(recipe.id)
+    assert not links.exists(recipe.id + 1)
+    assert len(failing_warm) == 1
+
+
+@pytest.mark.django_db
+def test_warm_is_not_repeated_while_in_progress(failing_warm):
+    """Пока карту загружает другой поток, запрос ее не загружает."""
+    links = ShortLinks()
+    with links._warm_lock:
+        assert not links.exists(1)
+    assert failing_warm == []
@@ -0,0 +1,117 @@
+import threading
+from collections import Counter
+
+import pytest
+from django.db import connection
+from rest_framework.test import APIClient
+
+from recipe.models import (FavoriteRecipes, Ingredient, IngredientRecipe,
+                           Recipe, ShoppingList, ShoppingListIngredient)
+from recipe.services import (add_recipe_link, ingredient_amounts,
+                             remove_recipe_link)
+
+THREADS = 8
+ROUNDS = 10
+SHARED_AMOUNT = 7
+
+
+def run_threads(target, arguments):
+    """target(*args) в отдельных потоках, стартующих одновременно."""
+    barrier = threading.Barrier(len(arguments))
+    errors = []
+
+    def worker(*args):
+        barrier.wait()
+        try:
+            target(*args)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=worker, args=args) for args in arguments
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+@pytest.fixture
+def cart_recipes(user):
+    """Рецепты с общим ингредиентом и по одному своему."""
+    shared = Ingredient.objects.create(name='Соль', measurement_unit='г')
+    recipes = []
+    for number in range(THREADS):
+        recipe = Recipe.objects.create(
+            author=user, name=f'Рецепт {number}', text='-',
+            cooking_time=1, image='recipes/test.png'
+        )
+        own = Ingredient.objects.create(
+            name=f'Ингредиент {number}', measurement_unit='г'
+        )
+        IngredientRecipe.objects.bulk_create([
+            IngredientRecipe(
+                recipe=recipe, ingredient=shared, amount=SHARED_AMOUNT
+            ),
+            IngredientRecipe(recipe=recipe, ingredient=own, amount=number + 1),
+        ])
+        recipes.append(recipe)
+    return recipes
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_cart_totals(user, cart_recipes):
+    """Суммы списка покупок сходятся при параллельных изменениях.
+
+    Каждый поток добавляет и удаляет свой рецепт; все рецепты делят
+    общий ингредиент, поэтому потоки одновременно меняют одну строку
+    сумм. В конце в корзине остается каждый второй рецепт.
+    """
+    def toggle(recipe, number):
+        for _ in range(ROUNDS):
+            assert add_recipe_link(ShoppingList, user.id, recipe.id)
+            assert remove_recipe_link(ShoppingList, user.id, recipe.id)
+        if number % 2 == 0:
+            assert add_recipe_link(ShoppingList, user.id, recipe.id)
+
+    run_threads(toggle, list(zip(cart_recipes, range(THREADS))))
+
+    expected = Counter()
+    in_cart = ShoppingList.objects.filter(user=user).values_list(
+        'recipe_id', flat=True
+    )
+    for amounts in ingredient_amounts(list(in_cart)).values():
+        expected.update(amounts)
+    assert len(in_cart) == THREADS // 2
+    assert dict(ShoppingListIngredient.objects.filter(
+        user=user
+    ).values_list('ingredient_id', 'amount')) == dict(expected)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('endpoint, model', [
+    ('favorite', FavoriteRecipes),
+    ('shopping_cart', ShoppingList),
+])
+def test_concurrent_duplicate_toggles(user, token, cart_recipes, endpoint,
+                                      model):
+    """Из одновременных одинаковых запросов данные меняет ровно один,
+    остальные получают 400, а не 500 или дубль."""
+    url = f'/api/recipes/{cart_recipes[0].id}/{endpoint}/'
+    for method, success in (('post', 201), ('delete', 204)):
+        statuses = Counter()
+
+        def request():
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+            statuses[getattr(client, method)(url).status_code] += 1
+
+        run_threads(request, [()] * THREADS)
+        assert statuses == {success: 1, 400: THREADS - 1}
+        assert model.objects.filter(user=user).count() == (
+            1 if method == 'post' else 0
+        )
+    assert not ShoppingListIngredient.objects.filter(user=user).exists()